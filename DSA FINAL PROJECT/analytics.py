@@ -0,0 +1,289 @@
+# analytics.py
+"""Sales analytics over completed orders, computed on NumPy columns.
+
+The first report loads every completed order (archives included) from
+Database.iter_sales into column arrays: one row per order (time, total) and
+one per line item (time, item, category, qty, revenue). After that, orders
+completed in the app are appended as their 'order_status_changed' events
+arrive, so nothing is read twice. Each report is a handful of masks and
+bincounts over those arrays, and results are cached per range until an
+order lands inside it.
+
+Times are the stored local timestamps as seconds since 1970, so hours and
+days bucket in the restaurant's own clock without any timezone work.
+
+Needs numpy (pip install numpy); Database.sales_report imports this module
+only when a report is first asked for.
+"""
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+BUCKETS = {'day': 'D', 'week': 'W', 'month': 'M'}
+OTHER_CATEGORY = 'Other'
+
+
+class Column:
+    """Growable 1-d array; appends double the buffer when it fills up"""
+
+    def __init__(self, dtype, capacity=4096):
+        self.data = np.empty(capacity, dtype)
+        self.size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, self.data.dtype)
+        needed = self.size + len(values)
+        if needed > len(self.data):
+            grown = np.empty(max(needed, 2 * len(self.data)), self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:needed] = values
+        self.size = needed
+
+    def values(self):
+        return self.data[:self.size]
+
+    def __len__(self):
+        return self.size
+
+
+class Codes:
+    """Interns strings as small ints so they can be bincounted"""
+
+    def __init__(self):
+        self.names = []
+        self.index = {}
+
+    def code(self, name):
+        code = self.index.get(name)
+        if code is None:
+            code = self.index[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def codes(self, names):
+        index, code = self.index, self.code
+        return np.fromiter((index[n] if n in index else code(n) for n in names), np.int32, len(names))
+
+
+def to_seconds(timestamps):
+    """Stored 'YYYY-MM-DD HH:MM:SS' texts as int64 local seconds since 1970"""
+    return np.array([t[:19].replace(' ', 'T') for t in timestamps], 'datetime64[s]').astype(np.int64)
+
+
+def day_seconds(day):
+    """'YYYY-MM-DD' (or a date) as local seconds at midnight"""
+    return int(np.datetime64(str(day), 's').astype(np.int64))
+
+
+class SalesAnalytics:
+    """Column store of completed orders behind Database.sales_report"""
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()       # guards _pending, which event threads append to
+        self._columns = threading.RLock()  # one report or clear() at a time
+        self._pending = []   # orders completed since the last report
+        self._cache = {}     # (start, end day, bucket, top) -> (first second, last second, report)
+        self.clear()
+        db.events.subscribe('order_status_changed', self.on_order_status_changed)
+
+    def clear(self):
+        """Drop everything; the next report reloads from the database"""
+        with self._columns:
+            self.loaded = False
+            self.order_id = Column(np.int64)
+            self.order_time = Column(np.int64)
+            self.order_total = Column(np.float64)
+            self.line_time = Column(np.int64)
+            self.line_item = Column(np.int32)
+            self.line_category = Column(np.int32)
+            self.line_qty = Column(np.int32)
+            self.line_revenue = Column(np.float64)
+            self.items = Codes()
+            self.categories = Codes()
+            self._cache.clear()
+
+    def on_order_status_changed(self, order, status, previous_status):
+        if status == 'completed' and previous_status != 'completed':
+            with self._lock:
+                self._pending.append(order)
+
+    # ---------- loading ----------
+    def _category_lookup(self):
+        """Array mapping menu id -> category code (unknown ids -> Other)"""
+        menu = self.db.menu_catalog().items
+        lookup = np.full(max((m['id'] for m in menu), default=0) + 1,
+                         self.categories.code(OTHER_CATEGORY), np.int32)
+        for m in menu:
+            lookup[m['id']] = self.categories.code(m['category'] or OTHER_CATEGORY)
+        return lookup
+
+    def _append(self, rows, categories, last_id=None):
+        """Add (order id, timestamp, total, menu id, name, qty, unit price) rows.
+
+        Rows come ordered by order id, one per line item (or one with no item
+        for an empty order); `last_id` is the order the previous batch ended on.
+        Returns the order id this batch ends on.
+        """
+        if not rows:
+            return last_id
+        ids, stamps, totals, menu_ids, names, qtys, prices = zip(*rows)
+        ids = np.array(ids, np.int64)
+        seconds = to_seconds(stamps)
+
+        first_rows = np.ones(len(ids), bool)
+        first_rows[1:] = ids[1:] != ids[:-1]
+        first_rows[0] = ids[0] != last_id
+        self.order_id.extend(ids[first_rows])
+        self.order_time.extend(seconds[first_rows])
+        self.order_total.extend(np.nan_to_num(np.array(totals, np.float64)[first_rows]))
+
+        has_item = np.array([name is not None for name in names], bool)
+        if has_item.any():
+            menu_ids = np.array([m or 0 for m in menu_ids], np.int64)[has_item]
+            qtys = np.array(qtys, dtype=object)[has_item].astype(np.int32)
+            prices = np.nan_to_num(np.array(prices, np.float64)[has_item])
+            known = menu_ids < len(categories)
+            self.line_time.extend(seconds[has_item])
+            self.line_item.extend(self.items.codes([n for n in names if n is not None]))
+            self.line_category.extend(np.where(known, categories[np.where(known, menu_ids, 0)],
+                                               self.categories.code(OTHER_CATEGORY)))
+            self.line_qty.extend(qtys)
+            self.line_revenue.extend(qtys * prices)
+        return int(ids[-1])
+
+    def _load(self):
+        categories = self._category_lookup()
+        last_id = None
+        for rows in self.db.iter_sales(include_archive=True):
+            last_id = self._append(rows, categories, last_id)
+        self.loaded = True
+
+    def _drain(self):
+        """Move orders completed since the last report into the columns"""
+        just_loaded = not self.loaded
+        if just_loaded:
+            self._load()
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        rows = []
+        for order in pending:
+            items = order['items'] or [{'menu_id': None, 'name': None, 'qty': None, 'unit_price': None}]
+            rows.extend((order['id'], order['timestamp'], order['total_price'],
+                         i.get('menu_id'), i['name'], i['qty'], i.get('unit_price')) for i in items)
+        rows.sort(key=lambda r: r[0])
+        if just_loaded:
+            # Orders completed while the load ran may be in both; keep one
+            seen = np.isin(np.array([r[0] for r in rows], np.int64), self.order_id.values())
+            rows = [r for r, dup in zip(rows, seen) if not dup]
+            if not rows:
+                return
+        self._append(rows, self._category_lookup())
+        changed = to_seconds(r[1] for r in rows)
+        low, high = changed.min(), changed.max()
+        self._cache = {key: entry for key, entry in self._cache.items()
+                       if entry[1] < low or entry[0] > high}
+
+    # ---------- reports ----------
+    def report(self, start=None, end=None, bucket=None, top=10):
+        """Sales figures for the days start..end (inclusive 'YYYY-MM-DD').
+
+        `start` defaults to the first sale and `end` to today. `bucket` is
+        'day', 'week' or 'month' for the time series; by default it is picked
+        from the range length. Everything returned is plain lists and
+        numbers, so the order service can send it as JSON.
+        """
+        with self._columns:
+            self._drain()
+            # An open end means today; keyed by the day itself, so a report
+            # cached yesterday is not served once today's sales start
+            key = (start, end or date.today().isoformat(), bucket, top)
+            if key not in self._cache:
+                self._cache[key] = self._report(start, end, bucket, top)
+            return self._cache[key][2]
+
+    def _report(self, start, end, bucket, top):
+
+        times = self.order_time.values()
+        end_day = date.fromisoformat(end) if end else date.today()
+        if start:
+            start_day = date.fromisoformat(start)
+        elif len(times):
+            start_day = date.fromisoformat(str(np.datetime64(int(times.min()), 's').astype('datetime64[D]')))
+        else:
+            start_day = end_day
+        low, high = day_seconds(start_day), day_seconds(end_day + timedelta(days=1))
+        days = (end_day - start_day).days + 1
+        bucket = bucket or ('day' if days <= 62 else 'week' if days <= 366 else 'month')
+
+        in_range = (times >= low) & (times < high)
+        totals = self.order_total.values()[in_range]
+        range_times = times[in_range]
+        hours = (range_times // 3600) % 24
+
+        line_times = self.line_time.values()
+        lines = (line_times >= low) & (line_times < high)
+        qty = self.line_qty.values()[lines]
+        revenue = self.line_revenue.values()[lines]
+
+        report = {
+            'start': start_day.isoformat(),
+            'end': end_day.isoformat(),
+            'bucket': bucket,
+            'orders': int(in_range.sum()),
+            'revenue': float(totals.sum()),
+            'hourly': {
+                'orders': np.bincount(hours, minlength=24).tolist(),
+                'revenue': np.bincount(hours, weights=totals, minlength=24).tolist(),
+            },
+            'series': self._series(range_times, totals, low, high, bucket),
+            'week_over_week': self._week_over_week(times, end_day),
+            'top_items': self._ranked(self.items.names, self.line_item.values()[lines], qty, revenue,
+                                      'name', top),
+            'categories': self._ranked(self.categories.names, self.line_category.values()[lines], qty,
+                                       revenue, 'category', None),
+        }
+        # Cached until an order lands between `first` and the end of the range
+        first = min(low, day_seconds(end_day - timedelta(days=13)))
+        return first, high - 1, report
+
+    def _series(self, times, totals, low, high, bucket):
+        unit = BUCKETS[bucket]
+        first = np.datetime64(low, 's').astype(f'datetime64[{unit}]')
+        last = np.datetime64(high - 1, 's').astype(f'datetime64[{unit}]')
+        count = int((last - first).astype(np.int64)) + 1
+        slots = (times.astype('datetime64[s]').astype(f'datetime64[{unit}]') - first).astype(np.int64)
+        labels = np.arange(first, last + 1).astype('datetime64[D]').astype(str)
+        return {
+            'labels': labels.tolist(),
+            'orders': np.bincount(slots, minlength=count).tolist(),
+            'revenue': np.bincount(slots, weights=totals, minlength=count).tolist(),
+        }
+
+    def _week_over_week(self, times, end_day):
+        """The 7 days ending on end_day against the 7 days before them"""
+        boundaries = [day_seconds(end_day - timedelta(days=d)) for d in (13, 6)] + \
+                     [day_seconds(end_day + timedelta(days=1))]
+        slot = np.searchsorted(boundaries, times, side='right') - 1
+        inside = (slot >= 0) & (slot < 2)
+        orders = np.bincount(slot[inside], minlength=2)
+        revenue = np.bincount(slot[inside], weights=self.order_total.values()[inside], minlength=2)
+        last_week, this_week = float(revenue[0]), float(revenue[1])
+        return {
+            'last_week': {'orders': int(orders[0]), 'revenue': last_week},
+            'this_week': {'orders': int(orders[1]), 'revenue': this_week},
+            'change': (this_week - last_week) / last_week * 100 if last_week else None,
+        }
+
+    @staticmethod
+    def _ranked(names, codes, qty, revenue, label, top):
+        """Per-name qty and revenue, highest revenue first (top N if given)"""
+        qty_by = np.bincount(codes, weights=qty, minlength=len(names))
+        revenue_by = np.bincount(codes, weights=revenue, minlength=len(names))
+        order = np.argsort(-revenue_by, kind='stable')
+        order = order[qty_by[order] > 0][:top]
+        return [{label: names[i], 'qty': int(qty_by[i]), 'revenue': float(revenue_by[i])} for i in order]
@@ -0,0 +1,341 @@
+# bench.py
+"""Headless benchmark for the order pipeline.
+
+Drives Database and OrderQueue from main.py without opening a Kivy window,
+synthesizes a history and a lunch rush from the menu, and reports
+throughput, p50/p99 latency and peak memory per operation as JSON.
+
+    python bench.py --history 1000000 --rush 2000 --out run.json
+    python bench.py --compare baseline.json run.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from main import Database, OrderQueue, display_time
+
+MENU = [
+    ("Beef Caldereta", 180.0, "Main"),
+    ("Chicken Adobo", 150.0, "Main"),
+    ("Pork Sinigang", 170.0, "Main"),
+    ("Kare-Kare", 220.0, "Main"),
+    ("Lechon Kawali", 190.0, "Main"),
+    ("Pancit Canton", 120.0, "Noodles"),
+    ("Lumpia", 80.0, "Sides"),
+    ("Rice", 25.0, "Sides"),
+    ("Garlic Rice", 35.0, "Sides"),
+    ("Iced Tea", 45.0, "Drinks"),
+    ("Calamansi Juice", 50.0, "Drinks"),
+    ("Halo-Halo", 95.0, "Desserts"),
+]
+CUSTOMERS = [
+    "Maria Santos", "Juan Dela Cruz", "Jose Rizal", "Ana Reyes", "Mark Bautista",
+    "Grace Villanueva", "Paolo Garcia", "Liza Mendoza", "Carlo Ramos", "Bea Aquino",
+]
+PRIORITY_MIX = [('dine-in', 0.70), ('takeout', 0.25), ('vip', 0.05)]
+
+
+# ==================== ORDER STREAMS ====================
+def random_order(rng, menu):
+    """One order dict shaped like the ones the app enqueues"""
+    lines = rng.sample(menu, rng.randint(1, 4))
+    items = [{'name': m['name'], 'qty': rng.choice((1, 1, 1, 2, 2, 3))} for m in lines]
+    prices = {m['name']: m['price'] for m in menu}
+    return {
+        'customer_name': rng.choice(CUSTOMERS),
+        'items': items,
+        'total_price': sum(prices[i['name']] * i['qty'] for i in items),
+        'priority': rng.choices([p for p, _ in PRIORITY_MIX], [w for _, w in PRIORITY_MIX])[0],
+        'prep_minutes': rng.randint(5, 25),
+    }
+
+
+def seed_history(db, rng, count, days=365, chunk=10000):
+    """Bulk-insert `count` completed orders spread over the last `days` days.
+
+    Goes straight to SQL with executemany so a million-order history takes
+    seconds rather than the hours one create_order call per row would.
+    """
+    menu = db.get_menu()
+    by_name = {m['name']: m for m in menu}
+    now = datetime.now()
+    cur = db.conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM orders")
+    next_id = cur.fetchone()[0] + 1
+    for start in range(0, count, chunk):
+        orders, lines = [], []
+        for order_id in range(next_id + start, next_id + min(start + chunk, count)):
+            order = random_order(rng, menu)
+            placed = now - timedelta(seconds=rng.randint(0, days * 86400))
+            orders.append((order_id, order['customer_name'], order['total_price'], 'completed',
+                           placed.strftime("%Y-%m-%d %H:%M:%S"), int(placed.timestamp()),
+                           order['priority'], order['prep_minutes']))
+            for i in order['items']:
+                m = by_name[i['name']]
+                lines.append((order_id, m['id'], m['name'], i['qty'], m['price']))
+        cur.executemany(
+            "INSERT INTO orders (id, customer_name, total_price, status, timestamp, ts_epoch, priority, prep_minutes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", orders
+        )
+        cur.executemany(
+            "INSERT INTO order_items (order_id, menu_id, name, qty, unit_price) VALUES (?, ?, ?, ?, ?)", lines
+        )
+        db.conn.commit()
+    db.rebuild_daily_stats()
+
+
+# ==================== MEASUREMENT ====================
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, peak_bytes):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        'count': len(latencies),
+        'ops_per_sec': len(latencies) / total if total else 0.0,
+        'mean_ms': total / len(latencies) * 1000 if latencies else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'peak_kb': peak_bytes / 1024 if peak_bytes is not None else None,
+    }
+
+
+class Probe:
+    """Runs calls one at a time; the first runs under tracemalloc for peak memory, the rest are timed"""
+
+    def __init__(self):
+        self.latencies = []
+        self.peak = None
+        self.traced_seconds = None
+
+    def __call__(self, call):
+        if self.peak is not None:
+            start = time.perf_counter()
+            result = call()
+            self.latencies.append(time.perf_counter() - start)
+            return result
+        tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            result = call()
+            self.traced_seconds = time.perf_counter() - start
+            self.peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return result
+
+    def results(self):
+        # Tracing slows a call down, so its time only stands in when nothing else ran
+        if not self.latencies and self.traced_seconds is not None:
+            return [self.traced_seconds], self.peak
+        return self.latencies, self.peak
+
+
+def measure(calls):
+    """Run each zero-argument call exactly once; returns (latencies, peak bytes)"""
+    probe = Probe()
+    for call in calls:
+        probe(call)
+    return probe.results()
+
+
+class Bench:
+    def __init__(self, db, queue, rng):
+        self.db = db
+        self.queue = queue
+        self.rng = rng
+        self.results = {}
+
+    def record(self, name, latencies, peak=None):
+        self.results[name] = summarize(latencies, peak)
+
+    def run_calls(self, name, calls):
+        self.record(name, *measure(calls))
+
+    def lunch_rush(self, orders):
+        """Enqueue a burst of orders, completing one for every two that arrive"""
+        menu = self.db.get_menu()
+        enqueue, complete = Probe(), Probe()
+        for n in range(orders):
+            order = random_order(self.rng, menu)
+            enqueue(lambda: self.queue.enqueue(order))
+            if n % 2:
+                complete(self.queue.dequeue)
+        self.record('queue.enqueue', *enqueue.results())
+        self.record('queue.dequeue', *complete.results())
+
+        cancel = Probe()
+        for order in self.queue.peek(min(100, self.queue.size())):
+            cancel(lambda: self.queue.cancel(order['id']))
+        self.record('queue.cancel', *cancel.results())
+
+    def writes(self, count):
+        menu = self.db.get_menu()
+        orders = [random_order(self.rng, menu) for _ in range(count)]
+        ids = []
+        self.run_calls('db.create_order', [
+            lambda o=o: ids.append(self.db.create_order(o['customer_name'], o['items'], o['total_price']))
+            for o in orders
+        ])
+        self.run_calls('db.update_order_status', [
+            lambda i=i: self.db.update_order_status(i, 'completed') for i in ids
+        ])
+        self.db.flush()
+
+    def reads(self, repeat, page_size=50, pages=20):
+        self.run_calls('db.get_menu', [self.db.get_menu] * repeat)
+        self.run_calls('db.get_pending_orders', [self.db.get_pending_orders] * repeat)
+        self.run_calls('db.get_today_stats', [self.db.get_today_stats] * repeat)
+        self.run_calls('db.get_best_sellers', [self.db.get_best_sellers] * max(1, repeat // 10))
+        self.run_calls('db.get_transactions.first_page', [
+            lambda: self.db.get_transactions(limit=page_size)
+        ] * repeat)
+
+        def walk():
+            page = self.db.get_transactions(limit=page_size)
+            for _ in range(pages - 1):
+                if not page:
+                    break
+                page = self.db.get_transactions(after=page[-1], limit=page_size)
+        self.run_calls(f'db.get_transactions.walk_{pages}_pages', [walk] * max(1, repeat // 10))
+
+    def refreshes(self, repeat, page_size=50):
+        """The data side of each screen refresh (no widgets are built)"""
+        self.run_calls('refresh.orders', [self.queue.get_all] * repeat)
+        self.run_calls('refresh.history', [lambda: self.db.get_transactions(limit=page_size)] * repeat)
+        self.run_calls('refresh.menu', [self.db.get_menu] * repeat)
+        self.run_calls('refresh.stats', [self.db.get_today_stats] * repeat)
+
+    def formatting(self, rows=10000):
+        """Render the display time for a scroll's worth of transaction rows"""
+        page = self.db.get_transactions(limit=rows)
+        self.run_calls('format.display_time', [lambda: [display_time(t) for t in page]] * 5)
+
+    def history_load(self):
+        """Hold every completed order in memory at once; peak_kb is what the records cost"""
+        self.run_calls('load.history_all', [lambda: list(self.db.iter_orders(status='completed'))])
+
+
+# ==================== REPORTS ====================
+def compare(baseline_path, current_path, threshold):
+    """Print per-operation deltas; return True if anything regressed past `threshold`"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    with open(current_path) as f:
+        current = json.load(f)['results']
+
+    regressed = False
+    print(f"{'operation':40} {'p50 ms':>18} {'p99 ms':>18} {'ops/s':>20}")
+    for name in sorted(set(baseline) | set(current)):
+        if name not in baseline or name not in current:
+            print(f"{name:40} {'(only in one run)':>18}")
+            continue
+        old, new = baseline[name], current[name]
+        cells = []
+        for key in ('p50_ms', 'p99_ms', 'ops_per_sec'):
+            delta = (new[key] - old[key]) / old[key] if old[key] else 0.0
+            worse = delta > threshold if key != 'ops_per_sec' else delta < -threshold
+            regressed |= worse and key != 'p99_ms'   # p99 is too noisy to gate on
+            cells.append(f"{new[key]:10.3f} {delta:+6.0%}{'!' if worse else ' '}")
+        print(f"{name:40} " + " ".join(cells))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless order pipeline benchmark")
+    parser.add_argument("--db", help="database file to use (default: a fresh temporary one)")
+    parser.add_argument("--history", type=int, default=100000, help="completed orders to synthesize")
+    parser.add_argument("--rush", type=int, default=2000, help="orders in the lunch-rush burst")
+    parser.add_argument("--writes", type=int, default=1000, help="direct create_order/update calls")
+    parser.add_argument("--repeat", type=int, default=200, help="repetitions of each read")
+    parser.add_argument("--seed", type=int, default=201, help="random seed")
+    parser.add_argument("--write-behind", action="store_true", help="benchmark the write-behind mode")
+    parser.add_argument("--journal-mode", help="SQLite journal_mode, e.g. WAL")
+    parser.add_argument("--synchronous", help="SQLite synchronous level, e.g. NORMAL")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two reports and exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative change that counts as a regression (default 0.2)")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    workdir = None
+    path = args.db
+    if not path:
+        workdir = tempfile.mkdtemp(prefix="restaurant-bench-")
+        path = os.path.join(workdir, "bench.db")
+    rng = random.Random(args.seed)
+
+    try:
+        fresh = not os.path.exists(path)
+        db = Database(path, write_behind=args.write_behind,
+                      journal_mode=args.journal_mode, synchronous=args.synchronous)
+        setup = {}
+        if fresh:
+            for name, price, category in MENU:
+                db.add_menu_item(name, price, category)
+            start = time.perf_counter()
+            seed_history(db, rng, args.history)
+            setup['seed_history_s'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        queue = OrderQueue(db)
+        setup['load_orders_s'] = time.perf_counter() - start
+
+        bench = Bench(db, queue, rng)
+        bench.lunch_rush(args.rush)
+        bench.writes(args.writes)
+        db.flush()
+        bench.reads(args.repeat)
+        bench.refreshes(args.repeat)
+        bench.formatting()
+        bench.history_load()
+
+        report = {
+            'meta': {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'python': sys.version.split()[0],
+                'sqlite': sqlite3.sqlite_version,
+                'history': args.history if fresh else None,
+                'rush': args.rush,
+                'writes': args.writes,
+                'repeat': args.repeat,
+                'seed': args.seed,
+                'write_behind': args.write_behind,
+                'journal_mode': args.journal_mode,
+                'synchronous': args.synchronous,
+                'setup': setup,
+            },
+            'results': bench.results,
+        }
+        db.close()
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+# bulk_io.py
+"""Streaming bulk import and export for the restaurant database.
+
+Imports read CSV or JSONL a row at a time, validate each row and insert in
+executemany batches inside one transaction, so a file either goes in whole
+or not at all. Exports stream orders through Database.iter_orders and write
+as they go, so memory stays flat however many orders there are.
+
+    python bulk_io.py import-menu menu.csv
+    python bulk_io.py import-orders orders.jsonl
+    python bulk_io.py export transactions.csv --status completed
+    python bulk_io.py export orders.parquet        (needs pyarrow)
+
+CSV files have a header row. Menu columns: name, price, category. Order
+columns: customer_name, status, timestamp, priority, total_price, items,
+where items is a JSON list of {"name", "qty"} objects (JSONL orders carry
+it as a list). Exports write the same columns plus id, so an export can be
+imported again.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+from main import PRIORITY_LEAD_MINUTES, Database, now_timestamp, timestamp_to_epoch
+
+ORDER_STATUSES = ('pending', 'completed', 'cancelled')
+EXPORT_COLUMNS = ['id', 'customer_name', 'status', 'timestamp', 'priority', 'total_price', 'items']
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportErrors(ValueError):
+    """Raised after an import is rolled back; `errors` lists (line, message)"""
+
+    def __init__(self, errors, total):
+        self.errors = errors
+        self.total = total
+        shown = "\n".join(f"  line {line}: {message}" for line, message in errors)
+        more = f"\n  ... and {total - len(errors)} more" if total > len(errors) else ""
+        super().__init__(f"{total} invalid rows, nothing imported:\n{shown}{more}")
+
+
+# ==================== READING ====================
+def file_format(path, fmt=None):
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.')).lower()
+    if fmt not in ('csv', 'jsonl', 'parquet'):
+        raise ValueError(f"Unsupported format: {fmt!r} (use csv, jsonl or parquet)")
+    return fmt
+
+
+def read_rows(path, fmt=None):
+    """(line number, row) for every record: a dict for CSV, the raw line for JSONL"""
+    fmt = file_format(path, fmt)
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        elif fmt == 'jsonl':
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_no, line   # decoded in Validator.check so a bad line is reported, not raised
+        else:
+            raise ValueError("Parquet files can be exported but not imported")
+
+
+class Validator:
+    """Turns raw rows into clean records, collecting errors instead of stopping"""
+
+    def __init__(self):
+        self.errors = []
+        self.total_errors = 0
+
+    def fail(self, line, message):
+        self.total_errors += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def check(self, rows, clean):
+        """Yield clean(row) for each valid row; invalid rows are recorded"""
+        for line, row in rows:
+            try:
+                if isinstance(row, str):
+                    row = json_row(row)
+                yield clean(row)
+            except (ValueError, TypeError, KeyError) as error:
+                self.fail(line, str(error))
+
+    def raise_if_failed(self):
+        if self.total_errors:
+            raise ImportErrors(self.errors, self.total_errors)
+
+
+def json_row(line):
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as error:
+        raise ValueError(f"invalid JSON: {error.msg} at column {error.colno}") from None
+    if not isinstance(row, dict):
+        raise ValueError(f"expected a JSON object, got {type(row).__name__}")
+    return row
+
+
+def clean_menu_item(row):
+    name = (row.get('name') or '').strip()
+    if not name:
+        raise ValueError("name is required")
+    price = float(row.get('price'))
+    if price <= 0:
+        raise ValueError(f"price must be positive, got {price}")
+    return {'name': name, 'price': price, 'category': (row.get('category') or 'Main').strip()}
+
+
+def clean_order(row):
+    items = row.get('items') or []
+    if isinstance(items, str):
+        items = json.loads(items)
+    if not isinstance(items, list) or not items:
+        raise ValueError("items must be a non-empty list")
+    clean_items = []
+    for i in items:
+        qty = int(i['qty'])
+        if qty <= 0 or not str(i['name']).strip():
+            raise ValueError(f"bad item {i!r}")
+        clean_items.append({'name': str(i['name']).strip(), 'qty': qty})
+
+    status = (row.get('status') or 'completed').lower()
+    if status not in ORDER_STATUSES:
+        raise ValueError(f"unknown status {status!r}")
+    priority = (row.get('priority') or 'dine-in').lower()
+    if priority not in PRIORITY_LEAD_MINUTES:
+        raise ValueError(f"unknown priority {priority!r}")
+    timestamp = row.get('timestamp') or now_timestamp()[0]
+    if timestamp_to_epoch(timestamp) is None:
+        raise ValueError(f"bad timestamp {timestamp!r}")
+    total = float(row.get('total_price'))
+    if total < 0:
+        raise ValueError(f"total_price must not be negative, got {total}")
+    return {
+        'customer_name': (row.get('customer_name') or 'Guest').strip(),
+        'items': clean_items,
+        'total_price': total,
+        'status': status,
+        'timestamp': timestamp[:19].replace('T', ' '),
+        'priority': priority,
+    }
+
+
+def import_file(db, path, kind, fmt=None):
+    """Import a menu or orders file in one transaction; returns the row count"""
+    validator = Validator()
+    if kind == 'menu':
+        records = validator.check(read_rows(path, fmt), clean_menu_item)
+        insert = db.import_menu_items
+    else:
+        records = validator.check(read_rows(path, fmt), clean_order)
+        insert = db.import_orders
+
+    def checked():
+        yield from records
+        # Raising here, inside the import, rolls the whole transaction back
+        validator.raise_if_failed()
+
+    return insert(checked())
+
+
+# ==================== WRITING ====================
+def export_row(order):
+    return {
+        'id': order['id'],
+        'customer_name': order['customer_name'],
+        'status': order['status'],
+        'timestamp': order['timestamp'],
+        'priority': order['priority'],
+        'total_price': order['total_price'],
+        'items': [{'name': i['name'], 'qty': i['qty'], 'unit_price': i['unit_price']} for i in order['items']],
+    }
+
+
+def export_orders(db, path, status=None, fmt=None, batch_size=5000):
+    """Stream orders (optionally only one status) to CSV, JSONL or Parquet; returns the count"""
+    fmt = file_format(path, fmt)
+    orders = (export_row(o) for o in db.iter_orders(status=status, batch_size=batch_size))
+    if fmt == 'parquet':
+        return _write_parquet(orders, path, batch_size)
+
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            writer = csv.DictWriter(f, fieldnames=EXPORT_COLUMNS)
+            writer.writeheader()
+            for row in orders:
+                row['items'] = json.dumps(row['items'], ensure_ascii=False)
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in orders:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+
+def _write_parquet(orders, path, batch_size):
+    """Columnar export, one row group per batch (pyarrow is optional)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow") from None
+
+    schema = pa.schema([
+        ('id', pa.int64()), ('customer_name', pa.string()), ('status', pa.string()),
+        ('timestamp', pa.string()), ('priority', pa.string()), ('total_price', pa.float64()),
+        ('items', pa.string()),
+    ])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in orders:
+            row['items'] = json.dumps(row['items'], ensure_ascii=False)
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import/export for restaurant.db")
+    parser.add_argument("--db", default="restaurant.db", help="database file")
+    parser.add_argument("--format", choices=("csv", "jsonl", "parquet"), help="default: from the file extension")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("import-menu", help="add menu items from a file").add_argument("path")
+    commands.add_parser("import-orders", help="add orders from a file").add_argument("path")
+    export = commands.add_parser("export", help="write orders to a file")
+    export.add_argument("path")
+    export.add_argument("--status", choices=ORDER_STATUSES, help="only orders with this status")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    try:
+        if args.command == "export":
+            count = export_orders(db, args.path, status=args.status, fmt=args.format)
+            print(f"Exported {count} orders to {args.path}")
+        else:
+            kind = 'menu' if args.command == "import-menu" else 'orders'
+            count = import_file(db, args.path, kind, fmt=args.format)
+            print(f"Imported {count} {'menu items' if kind == 'menu' else 'orders'} from {args.path}")
+    except (ValueError, RuntimeError, OSError) as error:   # ImportErrors is a ValueError
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
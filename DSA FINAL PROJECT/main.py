@@ -1,40 +1,920 @@
 # main.py
+import time
+STARTED = time.perf_counter()   # start of the --startup-report timings
 import json
+import os
+# Kivy parses sys.argv on import; leave our own command-line flags alone
+os.environ.setdefault("KIVY_NO_ARGS", "1")
 from kivy.lang import Builder
 from kivymd.app import MDApp
 from kivymd.uix.screen import MDScreen
-from kivymd.uix.label import MDLabel
-from kivymd.uix.list import (
-    TwoLineAvatarIconListItem,
-    IconLeftWidget,
-    IconRightWidget,
-    MDList,
-)
-from kivymd.uix.button import (
-    MDFillRoundFlatButton,
-    MDRectangleFlatButton,
-    MDFloatingActionButton,
+from kivymd.uix.list import TwoLineAvatarIconListItem
+# Widgets that only appear in KV are found through kivymd's Factory
+# registrations, and the ones a screen creates in Python are imported where
+# they are used, so nothing loads until its tab is first opened.
+
+from kivy.properties import (
+    StringProperty, ListProperty, ObjectProperty, BooleanProperty, DictProperty, NumericProperty
 )
-from kivymd.uix.dialog import MDDialog
-from kivymd.uix.bottomnavigation import MDBottomNavigation, MDBottomNavigationItem
-from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.card import MDCard
-from kivymd.uix.gridlayout import MDGridLayout
-from kivymd.uix.textfield import MDTextField
-from kivymd.uix.toolbar import MDTopAppBar
-
-from kivy.properties import StringProperty, ListProperty, ObjectProperty, BooleanProperty
-from kivy.clock import Clock
-from collections import deque
+from kivy.uix.widget import Widget
+from kivy.clock import Clock, mainthread
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, LifoQueue
+from urllib.parse import urlsplit
+import ast
+import contextlib
+import functools
+import heapq
+import http.client
+import logging
+import re
 import sqlite3
-from datetime import date, datetime
+import sys
+import threading
+import uuid
+from array import array
+from datetime import date, timedelta
+
+IMPORTED = time.perf_counter()
+log = logging.getLogger(__name__)
+
+# ==================== EVENTS ====================
+class EventBus:
+    """In-process change notifications.
+
+    Publishers name what changed ('order_added', 'order_removed',
+    'order_status_changed', 'order_started', 'menu_changed') and pass the details as keyword
+    arguments, so subscribers can apply just that change. 'write_failed'
+    reports a queued write-behind statement the database rejected. When the app runs
+    against the order service, 'service_connected' fires each time the event
+    stream (re)connects, since changes made while it was down were missed.
+    """
+    def __init__(self):
+        self._subscribers = {}
+
+    def subscribe(self, event, callback):
+        self._subscribers.setdefault(event, []).append(callback)
+
+    def unsubscribe(self, event, callback):
+        if callback in self._subscribers.get(event, []):
+            self._subscribers[event].remove(callback)
+
+    def publish(self, event, **payload):
+        for callback in list(self._subscribers.get(event, [])):
+            callback(**payload)
+
+
+# ==================== TIMESTAMPS ====================
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"        # how orders.timestamp is stored
+DISPLAY_FORMAT = "%m/%d/%Y %I:%M:%S %p"       # how the screens show it
+# Stored timestamps, plus the 'T' separator and fractional seconds that
+# older rows may carry; one precompiled match replaces trying strptime
+# formats until one stops raising.
+_TIMESTAMP_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})[ T](\d{2}):(\d{2}):(\d{2})")
+
+
+def now_timestamp():
+    """(stored timestamp text, epoch seconds) for the current moment"""
+    now = time.time()
+    return time.strftime(TIMESTAMP_FORMAT, time.localtime(now)), int(now)
+
+
+@functools.lru_cache(maxsize=8192)
+def timestamp_to_epoch(timestamp):
+    """Epoch seconds for stored timestamp text (local time), or None if unreadable"""
+    match = _TIMESTAMP_RE.match(timestamp or "")
+    if not match:
+        return None
+    year, month, day, hour, minute, second = map(int, match.groups())
+    return int(time.mktime((year, month, day, hour, minute, second, 0, 0, -1)))
+
+
+@functools.lru_cache(maxsize=8192)
+def format_epoch(epoch):
+    """Display string for epoch seconds"""
+    return time.strftime(DISPLAY_FORMAT, time.localtime(epoch))
+
+
+def format_timestamp(timestamp):
+    """Display string for stored timestamp text; unreadable text is shown as is"""
+    if not timestamp:
+        return "Time not available"
+    epoch = timestamp_to_epoch(timestamp)
+    return format_epoch(epoch) if epoch is not None else timestamp
+
+
+def display_time(order):
+    """Display string for an order's timestamp, straight from ts_epoch when it has one"""
+    epoch = order.get('ts_epoch')
+    if epoch is not None:
+        return format_epoch(epoch)
+    return format_timestamp(order.get('timestamp'))
+
+
+# ==================== PROFILING ====================
+class Timing:
+    """Count, total, max and a latency histogram for one statement or method"""
+    BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)   # last bucket: slower than all
+
+    def add(self, seconds, rows=0):
+        ms = seconds * 1000
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.rows += rows
+        self.histogram[next((i for i, b in enumerate(self.BUCKETS_MS) if ms <= b), len(self.BUCKETS_MS))] += 1
+
+    def percentile(self, pct):
+        """Upper bound (ms) of the bucket holding the pct-th percentile"""
+        target = self.count * pct / 100
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            seen += n
+            if seen >= target and n:
+                return min(self.BUCKETS_MS[i], self.max * 1000) if i < len(self.BUCKETS_MS) else self.max * 1000
+        return 0.0
+
+    def to_dict(self):
+        return {
+            'count': self.count, 'total_ms': self.total * 1000, 'max_ms': self.max * 1000,
+            'mean_ms': self.total * 1000 / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(50), 'p95_ms': self.percentile(95), 'rows': self.rows,
+            'histogram': dict(zip([f"<={b}ms" for b in self.BUCKETS_MS] + ["slower"], self.histogram)),
+        }
+
+
+class Profiler:
+    """Opt-in timings of SQL statements, DB calls and screen refreshes.
+
+    Off unless enabled (main.py --profile), in which case Database uses a
+    ProfiledCursor and @profiled methods report here. Statements are keyed by
+    normalized text, and the first time one runs slower than SLOW_QUERY_MS
+    its EXPLAIN QUERY PLAN is kept for the report.
+    """
+    SLOW_QUERY_MS = 50
+    _LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+    _IN_LIST = re.compile(r"\bIN \((?:\?, )*\?\)", re.IGNORECASE)
+
+    def __init__(self):
+        self.enabled = False
+        self.timings = {}   # (kind, name) -> Timing
+        self.plans = {}     # normalized SQL -> query plan lines
+        self._lock = threading.Lock()
+
+    def normalize(self, sql):
+        sql = " ".join(sql.split())
+        sql = self._LITERALS.sub("?", sql)
+        return self._IN_LIST.sub("IN (...)", sql)
+
+    def record(self, kind, name, seconds, rows=0):
+        with self._lock:
+            timing = self.timings.get((kind, name))
+            if timing is None:
+                timing = self.timings[(kind, name)] = Timing()
+            timing.add(seconds, rows)
+
+    def wants_plan(self, sql, seconds):
+        return seconds * 1000 >= self.SLOW_QUERY_MS and sql not in self.plans
+
+    def report(self):
+        """Plain-text summary, slowest total time first"""
+        with self._lock:
+            items = sorted(self.timings.items(), key=lambda kv: kv[1].total, reverse=True)
+            plans = dict(self.plans)
+        if not items:
+            return "No timings recorded" + ("" if self.enabled else " (start with --profile)")
+        lines = [f"{'kind':6} {'count':>7} {'total ms':>10} {'mean':>8} {'p50':>7} {'p95':>7} {'max':>8} {'rows':>8}  name"]
+        for (kind, name), t in items:
+            d = t.to_dict()
+            lines.append(f"{kind:6} {d['count']:7} {d['total_ms']:10.1f} {d['mean_ms']:8.2f} {d['p50_ms']:7.2f} "
+                         f"{d['p95_ms']:7.2f} {d['max_ms']:8.2f} {d['rows']:8}  {name}")
+        for sql, plan in plans.items():
+            lines += ["", f"Slow query plan: {sql}"] + [f"  {step}" for step in plan]
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Write every timing, histogram and captured plan as JSON"""
+        with self._lock:
+            data = {
+                'timings': [dict(kind=kind, name=name, **t.to_dict()) for (kind, name), t in self.timings.items()],
+                'plans': self.plans,
+            }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+
+PROFILER = Profiler()
+
+
+def profiled(fn):
+    """Time a method into PROFILER (kind 'ui') when profiling is on"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not PROFILER.enabled:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            PROFILER.record('ui', fn.__qualname__, time.perf_counter() - start)
+    return wrapper
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """sqlite3 cursor that reports each statement's time and rows to PROFILER.
+
+    SQLite does most of a query's work while rows are fetched, so a
+    statement's time runs from execute until the next execute on this cursor
+    or until fetchall, and fetched rows are counted against it.
+    """
+    _open = None   # [sql, params, normalized, seconds, rows] of the current statement
+
+    def _close(self):
+        if self._open:
+            sql, params, name, seconds, rows = self._open
+            self._open = None
+            PROFILER.record('sql', name, seconds, rows)
+            if params is not None and PROFILER.wants_plan(name, seconds) \
+                    and (sql.split(None, 1) or [''])[0].upper() in ('SELECT', 'WITH', 'UPDATE', 'DELETE'):
+                try:
+                    plan = sqlite3.Cursor(self.connection).execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+                    PROFILER.plans[name] = [row[-1] for row in plan]
+                except sqlite3.Error:
+                    pass
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._open:
+                self._open[3] += time.perf_counter() - start
+
+    def execute(self, sql, params=()):
+        self._close()
+        self._open = [sql, params, PROFILER.normalize(sql), 0.0, 0]
+        return self._timed(super().execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        self._close()
+        seq_of_params = list(seq_of_params)
+        # params None: there is no single parameter set to explain the plan with
+        self._open = [sql, None, PROFILER.normalize(sql), 0.0, len(seq_of_params)]
+        result = self._timed(super().executemany, sql, seq_of_params)
+        self._close()
+        return result
+
+    def __next__(self):
+        row = self._timed(super().__next__)   # StopIteration passes through uncounted
+        if self._open:
+            self._open[4] += 1
+        return row
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if self._open and row is not None:
+            self._open[4] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, size if size is not None else self.arraysize)
+        if self._open:
+            self._open[4] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._open:
+            self._open[4] += len(rows)
+        self._close()
+        return rows
+
+    def close(self):
+        self._close()   # Database closes each operation's cursor; its last statement still counts
+        super().close()
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose cursors, and execute shortcuts, are ProfiledCursors"""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+def connect(database, **kwargs):
+    """sqlite3.connect, profiled when PROFILER is on"""
+    if PROFILER.enabled:
+        kwargs['factory'] = ProfiledConnection
+    return sqlite3.connect(database, **kwargs)
+
+
+# ==================== MENU CATALOG ====================
+class MenuCatalog:
+    """Read-only snapshot of the menu, indexed by id, name and category.
+
+    The menu changes rarely but is read on every visit to the menu tab and
+    for every order line, so Database keeps one of these in memory. A change
+    never edits a catalog in place: add/delete build the next version, so a
+    screen holding the old one can tell it is stale by comparing `version`.
+    """
+
+    def __init__(self, items, version=0):
+        self.version = version
+        # Same order get_menu has always returned: by category, then name
+        self.items = sorted(items, key=lambda m: (m['category'] or '', m['name']))
+        self.by_id = {m['id']: m for m in self.items}
+        self.by_name = {m['name']: m for m in self.items}
+        self.by_category = {}
+        for m in self.items:
+            self.by_category.setdefault(m['category'], []).append(m)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def get(self, item_id):
+        return self.by_id.get(item_id)
+
+    def find(self, name):
+        return self.by_name.get(name)
+
+    def price(self, name):
+        """Unit price of a menu item by name, or None if it is not on the menu"""
+        item = self.by_name.get(name)
+        return item['price'] if item else None
+
+    def total(self, items):
+        """Price a list of {'name', 'qty'} items; lines not on the menu count as 0"""
+        return sum((self.price(i['name']) or 0) * i['qty'] for i in items)
+
+    def with_item(self, item):
+        return MenuCatalog([m for m in self.items if m['id'] != item['id']] + [item], self.version + 1)
+
+    def without(self, item_id):
+        return MenuCatalog([m for m in self.items if m['id'] != item_id], self.version + 1)
+
+
+# ==================== ORDER RECORDS ====================
+class Record:
+    """Base for slotted records that can also be read like the dicts they replace.
+
+    `record['name']`, `record.get('name')` and `'name' in record` all work,
+    so code written against order dicts keeps working unchanged, while each
+    record costs a fixed block of slots instead of a hash table.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def keys(self):
+        return self.__slots__
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class LineItem(Record):
+    """One order line. Shared between orders (see line_item), so never modified."""
+    __slots__ = ('menu_id', 'name', 'qty', 'unit_price')
+
+    def __init__(self, menu_id, name, qty, unit_price):
+        self.menu_id = menu_id
+        self.name = name
+        self.qty = qty
+        self.unit_price = unit_price
+
+
+_LINE_ITEMS = {}
+LINE_ITEM_CACHE_SIZE = 65536
+
+
+def line_item(menu_id, name, qty, unit_price):
+    """The shared LineItem for these values.
+
+    A history is mostly the same few dozen (menu item, qty, price) lines
+    over and over, so a million orders reference a few hundred LineItems.
+    """
+    key = (menu_id, name, qty, unit_price)
+    item = _LINE_ITEMS.get(key)
+    if item is None:
+        if len(_LINE_ITEMS) >= LINE_ITEM_CACHE_SIZE:
+            _LINE_ITEMS.clear()   # items already handed out stay valid
+        item = _LINE_ITEMS[key] = LineItem(menu_id, sys.intern(name), qty, unit_price)
+    return item
+
+
+def line_items(items):
+    """Tuple of LineItems from {'name', 'qty', 'menu_id'?, 'unit_price'?} items"""
+    return tuple(i if isinstance(i, LineItem) else line_item(i.get('menu_id'), i['name'], i['qty'], i.get('unit_price'))
+                 for i in items)
+
+
+class OrderRecord(Record):
+    """One order, as returned by Database and held by OrderQueue.
+
+    Fields an order does not have are None, e.g. completed_at while it is
+    pending. `items` is a tuple of shared LineItems.
+    """
+    __slots__ = (
+        'id', 'customer_name', 'items', 'total_price', 'status', 'timestamp', 'ts_epoch', 'priority',
+        'promised_at', 'prep_minutes', 'created_at', 'started_at', 'completed_at',
+        'discount_code', 'discount', 'tax', 'client_key',
+    )
+
+    def __init__(self, id, customer_name, items=(), total_price=None, status=None, timestamp=None,
+                 ts_epoch=None, priority='dine-in', promised_at=None, prep_minutes=None, created_at=None,
+                 started_at=None, completed_at=None, discount_code=None, discount=None, tax=None,
+                 client_key=None):
+        self.id = id
+        self.customer_name = customer_name
+        self.items = items
+        self.total_price = total_price
+        self.status = status
+        self.timestamp = timestamp
+        self.ts_epoch = ts_epoch
+        self.priority = priority
+        self.promised_at = promised_at
+        self.prep_minutes = prep_minutes
+        self.created_at = created_at
+        self.started_at = started_at
+        self.completed_at = completed_at
+        self.discount_code = discount_code
+        self.discount = discount
+        self.tax = tax
+        self.client_key = client_key
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def to_dict(self):
+        order = super().to_dict()
+        order['items'] = [i.to_dict() for i in self.items]
+        return order
+
+    @classmethod
+    def from_dict(cls, order):
+        """Record for an order dict (e.g. one sent by the order service); unknown keys are dropped"""
+        fields = {key: order[key] for key in cls.__slots__ if key in order}
+        fields['items'] = line_items(order.get('items') or ())
+        return cls(**fields)
+
+
+def to_plain(value):
+    """json.dumps `default` hook: records become dicts"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# ==================== PRICING ====================
+TAX_RATE = 0.12   # VAT, already included in menu prices
+DISCOUNT_RATES = {'senior': 0.20, 'pwd': 0.20, 'staff': 0.10}
+
+
+class PricingEngine:
+    """Authoritative order totals, priced from one MenuCatalog.
+
+    `prices` is a list indexed by menu id (None where no item has that id),
+    so pricing a line or a million of them is an index, not a name lookup.
+    A line's 'modifiers' name add-ons that are themselves menu items (say
+    "Extra Rice"); each becomes its own line at the parent's qty. Order
+    discounts come from DISCOUNT_RATES, and since prices include VAT, `tax`
+    is the VAT share of the total rather than something added to it.
+    """
+
+    def __init__(self, catalog, tax_rate=TAX_RATE):
+        self.catalog = catalog
+        self.tax_rate = tax_rate
+        self.prices = [None] * (max((m['id'] for m in catalog.items), default=0) + 1)
+        for m in catalog.items:
+            self.prices[m['id']] = m['price']
+
+    def _line(self, name, qty):
+        item = self.catalog.find(name)
+        if item is None:
+            raise ValueError(f"{name!r} is not on the menu")
+        return line_item(item['id'], item['name'], qty, self.prices[item['id']])
+
+    def price_order(self, items, discount_code=None):
+        """Price {'name', 'qty', 'modifiers'?} items; raises ValueError for
+        anything off the menu, a bad qty or an unknown discount code"""
+        if discount_code is not None and discount_code not in DISCOUNT_RATES:
+            raise ValueError(f"Unknown discount: {discount_code}")
+        lines = []
+        for item in items:
+            qty = int(item['qty'])
+            if qty <= 0:
+                raise ValueError(f"Quantity must be positive: {item!r}")
+            lines.append(self._line(item['name'], qty))
+            lines.extend(self._line(name, qty) for name in item.get('modifiers', ()))
+        subtotal = round(sum(line['qty'] * line['unit_price'] for line in lines), 2)
+        discount = round(subtotal * DISCOUNT_RATES.get(discount_code, 0.0), 2)
+        total = round(subtotal - discount, 2)
+        return {
+            'items': lines,
+            'subtotal': subtotal,
+            'discount_code': discount_code,
+            'discount': discount,
+            'tax': round(total * self.tax_rate / (1 + self.tax_rate), 2),
+            'total_price': total,
+        }
+
+    def audit(self, orders, lines, reprice=False, limit=100, tolerance=0.005):
+        """Recompute many orders' totals at once and report the ones that are off.
+
+        `orders` is (ids, total_price, discount_code) columns and `lines` is (order_id, menu_id, qty, unit_price) columns, with -1 for
+        a missing menu id or price. Lines are priced at their recorded
+        unit_price, or at today's menu price with `reprice`. An order is
+        flagged when its total is off by more than `tolerance` or it has a
+        line that cannot be priced. Needs numpy.
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise RuntimeError("Price audits need numpy: pip install numpy") from None
+
+        ids = np.asarray(orders[0], np.int64)
+        by_id = np.argsort(ids, kind='stable')
+        ids = ids[by_id]
+        totals = np.asarray(orders[1], np.float64)[by_id]
+        rates = np.array([DISCOUNT_RATES.get(code, 0.0) for code in orders[2]], np.float64)[by_id]
+        line_order, menu_ids = np.asarray(lines[0], np.int64), np.asarray(lines[1], np.int64)
+        qty = np.asarray(lines[2], np.float64)
+        if reprice:
+            vector = np.array([-1.0 if p is None else p for p in self.prices], np.float64)
+            known = (menu_ids >= 0) & (menu_ids < len(vector))
+            unit = np.where(known, vector[np.where(known, menu_ids, 0)], -1.0)
+        else:
+            unit = np.asarray(lines[3], np.float64)
+        unpriced = unit < 0
+
+        slot = np.searchsorted(ids, line_order)
+        subtotal = np.bincount(slot, weights=qty * np.where(unpriced, 0.0, unit), minlength=len(ids))
+        expected = np.round(np.round(subtotal, 2) * (1 - rates), 2)
+        unpriced_lines = np.bincount(slot, weights=unpriced, minlength=len(ids)).astype(np.int64)
+        difference = totals - expected
+        flagged = np.flatnonzero((np.abs(difference) > tolerance) | (unpriced_lines > 0))
+        worst = flagged[np.argsort(-np.abs(difference[flagged]), kind='stable')][:limit]
+        return {
+            'orders': len(ids),
+            'lines': len(line_order),
+            'mismatched': len(flagged),
+            'difference': float(difference[flagged].sum()),
+            'mismatches': [
+                {'id': int(ids[i]), 'total_price': float(totals[i]), 'expected': float(expected[i]),
+                 'difference': float(difference[i]), 'unpriced_lines': int(unpriced_lines[i])}
+                for i in worst
+            ],
+        }
+
 
 # ==================== DATABASE ====================
+def _batches(iterable, size):
+    """Lists of up to `size` items from any iterable, without reading ahead"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+class ConnectionManager:
+    """The writer connection of a database file plus a pool of read-only ones.
+
+    SQLite has one writer at a time, but in WAL mode any number of readers
+    can each work on a snapshot without ever blocking it. `writer` takes
+    every mutation, under `lock`; reader() lends a read-only connection for
+    one operation, inside one read transaction so all its queries see the
+    same snapshot. Outside WAL a reader would hold up the writer's commits
+    (and :memory: has no second connection), so reader() lends the writer
+    instead, under the lock, as every read did before.
+    """
+    def __init__(self, db_name, pool_size=4):
+        self.db_name = db_name
+        self.pool_size = pool_size
+        self.writer = connect(db_name, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.wal = False
+        self._idle = LifoQueue()
+
+    def check_wal(self):
+        """Use the reader pool if the database is (now) in WAL mode"""
+        mode = self.writer.execute("PRAGMA journal_mode").fetchone()[0]
+        self.wal = mode.lower() == 'wal' and self.db_name != ":memory:"
+
+    def open_reader(self):
+        """A new read-only connection (the writer for :memory:)"""
+        if self.db_name == ":memory:":
+            return self.writer
+        return connect(f"file:{os.path.abspath(self.db_name)}?mode=ro", uri=True, check_same_thread=False)
+
+    @contextlib.contextmanager
+    def reader(self):
+        if not self.wal:
+            with self.lock:
+                yield self.writer
+            return
+        try:
+            conn = self._idle.get_nowait()
+        except Empty:
+            conn = self.open_reader()
+        try:
+            conn.execute("BEGIN")   # one snapshot for the whole operation
+            yield conn
+        finally:
+            conn.rollback()
+            if self._idle.qsize() < self.pool_size:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+        self.writer.close()
+
+
+def _locked(method):
+    """Run a Database method under the writer lock, on a cursor of its own.
+
+    The write-behind flusher thread shares the writer connection with the
+    caller, so every mutating method takes the lock first.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock, self._operation(self.conn):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _reads(method):
+    """Run a read-only Database method on a pooled snapshot connection.
+
+    Queued mutations are written out first so the read sees them. Called
+    from inside another method it just shares that method's cursor and
+    flushes nothing, so a write that reads back sees its own uncommitted
+    rows and a write-behind batch is never committed halfway.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(self._op, 'cursor', None) is not None:
+            return method(self, *args, **kwargs)
+        if self._pending:
+            self.flush()
+        with self.connections.reader() as conn, self._operation(conn):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class Database:
-    def __init__(self, db_name="restaurant.db"):
-        self.conn = sqlite3.connect(db_name, check_same_thread=False)
-        self.cursor = self.conn.cursor()
+    ARCHIVE_AFTER_DAYS = 90
+    # Errors that belong to one statement, so retrying its batch can never succeed
+    REJECTED_WRITES = (sqlite3.IntegrityError, sqlite3.DataError, sqlite3.InterfaceError, sqlite3.ProgrammingError)
+    _ARCHIVE_FILE = re.compile(r"^(\d{4}-\d{2})\.db$")
+
+    def __init__(self, db_name="restaurant.db", events=None, write_behind=False,
+                 flush_interval_ms=200, flush_ops=100, journal_mode=None, synchronous=None,
+                 archive_dir=None, read_pool_size=4):
+        """Open (and migrate) the restaurant database.
+
+        With `write_behind` on, mutations are queued and written in one
+        transaction every `flush_interval_ms` or every `flush_ops` queued
+        statements, whichever comes first. `journal_mode` and `synchronous`
+        set the matching SQLite pragmas (e.g. "WAL" and "NORMAL").
+        Archived orders live in one SQLite file per month under
+        `archive_dir` (default: "<db name>_archive" next to the database).
+        In WAL mode reads run on up to `read_pool_size` pooled read-only
+        connections (see ConnectionManager), so they never wait on writes.
+        """
+        self.events = events or EventBus()
+        if archive_dir is None and db_name != ":memory:":
+            archive_dir = os.path.splitext(db_name)[0] + "_archive"
+        self.archive_dir = archive_dir
+        self._archives = {}    # month -> open archive Database
+        self.db_name = db_name
+        self.connections = ConnectionManager(db_name, read_pool_size)
+        self.conn = self.connections.writer
+        self._cursor = self.conn.cursor()   # for setup, before any operation runs
+        self._op = threading.local()        # .cursor: the cursor of the operation running on this thread
+        self._lock = self.connections.lock
+        self._pending = []     # queued (sql, params) statements and deferred calls
+        self._unflushed = {}   # order id -> latest (status, total_price, customer_name, items, created_at, started_at)
+        self._unflushed_keys = {}   # client_key -> id of orders created since the last flush
+        self._last_ids = {}
+        self._catalog = None
+        self._analytics = None   # analytics.SalesAnalytics, made by the first sales_report
+        self._pricing = None
+        self.write_behind = write_behind
+        self.flush_interval_ms = flush_interval_ms
+        self.flush_ops = flush_ops
+        self._set_pragmas(journal_mode, synchronous)
         self.create_tables()
+        self.connections.check_wal()
+
+        self._flusher = None
+        if write_behind:
+            self._wake = threading.Event()
+            self._closing = False
+            self._flusher = threading.Thread(target=self._flush_loop, name="db-write-behind", daemon=True)
+            self._flusher.start()
+
+    @property
+    def cursor(self):
+        """The cursor of the operation running on this thread (see _locked and _reads)"""
+        cursor = getattr(self._op, 'cursor', None)
+        return cursor if cursor is not None else self._cursor
+
+    @contextlib.contextmanager
+    def _operation(self, conn):
+        """Give this thread a fresh cursor on `conn` for one operation"""
+        outer = getattr(self._op, 'cursor', None)
+        if outer is not None and outer.connection is conn:
+            yield   # nested call: keep the caller's cursor
+            return
+        self._op.cursor = conn.cursor()
+        try:
+            yield
+        finally:
+            self._op.cursor.close()
+            self._op.cursor = outer
+
+    def _set_pragmas(self, journal_mode, synchronous):
+        if journal_mode:
+            if journal_mode.upper() not in JOURNAL_MODES:
+                raise ValueError(f"Unknown journal mode: {journal_mode}")
+            self.cursor.execute(f"PRAGMA journal_mode = {journal_mode.upper()}")
+        if synchronous:
+            if synchronous.upper() not in SYNCHRONOUS_LEVELS:
+                raise ValueError(f"Unknown synchronous level: {synchronous}")
+            self.cursor.execute(f"PRAGMA synchronous = {synchronous.upper()}")
+
+    # ---------- write-behind ----------
+    def _write(self, sql, params):
+        """Run one mutation now, or queue it when write-behind is on"""
+        if self.write_behind:
+            self._pending.append((sql, params))
+            if len(self._pending) >= self.flush_ops:
+                self._wake.set()
+        else:
+            self.cursor.execute(sql, params)
+
+    def _defer(self, fn, *args):
+        """Call fn now, or as part of the next flush when write-behind is on"""
+        if self.write_behind:
+            self._pending.append(functools.partial(fn, *args))
+        else:
+            fn(*args)
+
+    def _commit(self):
+        if not self.write_behind:
+            self.conn.commit()
+
+    def _next_id(self, table):
+        """Hand out ids for rows that are queued but not inserted yet.
+
+        The table is checked every time, not just the first: rows can also
+        arrive through imports or another connection, and an id they took
+        must never be handed out again.
+        """
+        self.cursor.execute(
+            f"SELECT MAX(COALESCE((SELECT MAX(id) FROM {table}), 0), "
+            "COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0))", (table,)
+        )
+        self._last_ids[table] = max(self._last_ids.get(table, 0), self.cursor.fetchone()[0]) + 1
+        return self._last_ids[table]
+
+    @_locked
+    def flush(self):
+        """Write every queued mutation in a single transaction.
+
+        Statements are grouped by their SQL text, in the order each text was
+        first queued, and every group goes through one executemany call.
+        That keeps an order's INSERT ahead of its later UPDATE (and of its
+        line items), and rows within a group keep their queue order.
+        Deferred calls (the stats rollup) run last, once all rows exist.
+
+        If the database rejects a statement (a duplicate id, say), the batch
+        is replayed one statement at a time: the rejected ones are dropped,
+        logged and published as 'write_failed', and the rest are committed.
+        Any other error (a locked or full disk) puts the whole batch back
+        for the next flush to retry.
+        """
+        if not self._pending:
+            return
+        ops, self._pending = self._pending, []
+        rejected = []
+        try:
+            try:
+                self._apply_batch(ops)
+            except self.REJECTED_WRITES:
+                self.conn.rollback()
+                rejected = self._replay(ops)
+            self.conn.commit()
+        except Exception:
+            # Put the batch back so nothing is lost; the next flush retries it
+            self.conn.rollback()
+            self._pending = ops + self._pending
+            raise
+        self._unflushed.clear()
+        self._unflushed_keys.clear()
+        if rejected:
+            self._catalog = None   # it may list a menu row that was never written
+        for op, error in rejected:
+            sql, params = (op.func.__name__, op.args) if callable(op) else op
+            log.error("Write-behind dropped %s %r: %s", sql, params, error)
+            self.events.publish('write_failed', sql=sql, params=params, error=str(error))
+
+    def _apply_batch(self, ops):
+        groups = {}
+        deferred = []
+        for op in ops:
+            if callable(op):
+                deferred.append(op)
+            else:
+                groups.setdefault(op[0], []).append(op[1])
+        for sql, rows in groups.items():
+            self.cursor.executemany(sql, rows)
+        for call in deferred:
+            call()
+
+    def _replay(self, ops):
+        """Run ops one at a time in queue order; returns the (op, error) pairs that were rolled back"""
+        rejected = []
+        self.cursor.execute("BEGIN")
+        for op in ops:
+            self.cursor.execute("SAVEPOINT queued_write")
+            try:
+                if callable(op):
+                    op()
+                else:
+                    self.cursor.execute(*op)
+            except self.REJECTED_WRITES as error:
+                self.cursor.execute("ROLLBACK TO queued_write")
+                rejected.append((op, error))
+            self.cursor.execute("RELEASE queued_write")
+        return rejected
+
+    def _flush_loop(self):
+        while not self._closing:
+            self._wake.wait(self.flush_interval_ms / 1000)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Write-behind flush failed; will retry")
+
+    def close(self):
+        """Flush anything still queued and close the connection"""
+        if self._flusher:
+            self._closing = True
+            self._wake.set()
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        self.connections.close()
+        for archive in self._archives.values():
+            archive.close()
+        self._archives = {}
 
     def create_tables(self):
         self.cursor.execute('''
@@ -56,145 +936,1809 @@ class Database:
             )
         ''')
         self.conn.commit()
+        self.migrate()
+
+    # ---------- schema migrations ----------
+    # PRAGMA user_version records how many of these steps a restaurant.db
+    # has already run, so each one executes exactly once per database.
+    def _add_order_indexes(self):
+        """v1: index orders by (status, timestamp) for the queue and history queries"""
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_status_timestamp ON orders (status, timestamp)"
+        )
+
+    def _add_daily_stats(self):
+        """v2: per-day rollups of completed orders, filled from existing history"""
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_stats (
+                day TEXT PRIMARY KEY,
+                orders INTEGER NOT NULL DEFAULT 0,
+                revenue REAL NOT NULL DEFAULT 0
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_item_stats (
+                day TEXT NOT NULL,
+                name TEXT NOT NULL,
+                qty INTEGER NOT NULL DEFAULT 0,
+                revenue REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, name)
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_category_stats (
+                day TEXT NOT NULL,
+                category TEXT NOT NULL,
+                qty INTEGER NOT NULL DEFAULT 0,
+                revenue REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, category)
+            )
+        ''')
+
+    def _add_order_scheduling(self):
+        """v3: priority class, promised time and prep estimate for the kitchen scheduler"""
+        self.cursor.execute("ALTER TABLE orders ADD COLUMN priority TEXT DEFAULT 'dine-in'")
+        self.cursor.execute("ALTER TABLE orders ADD COLUMN promised_at DATETIME")
+        self.cursor.execute("ALTER TABLE orders ADD COLUMN prep_minutes REAL")
+
+    def _add_order_items(self):
+        """v4: move line items out of the orders.items JSON blob into order_items"""
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS order_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL REFERENCES orders (id),
+                menu_id INTEGER REFERENCES menu (id),
+                name TEXT NOT NULL,
+                qty INTEGER NOT NULL,
+                unit_price REAL
+            )
+        ''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_menu ON order_items (menu_id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_name ON order_items (name)")
+
+        # Stream the old blobs in batches rather than loading the whole table
+        menu = self.menu_catalog()
+        reader = self.conn.cursor()
+        reader.execute("SELECT id, items FROM orders WHERE items IS NOT NULL")
+        while True:
+            rows = reader.fetchmany(1000)
+            if not rows:
+                break
+            lines = []
+            for order_id, text in rows:
+                try:
+                    items = self._decode_items(text)
+                except (ValueError, SyntaxError):
+                    continue  # corrupted blob: nothing to migrate
+                lines.extend((order_id,) + line for line in self._resolve_items(items, menu))
+            self.cursor.executemany(
+                "INSERT INTO order_items (order_id, menu_id, name, qty, unit_price) VALUES (?, ?, ?, ?, ?)",
+                lines
+            )
+        self.cursor.execute("UPDATE orders SET items = NULL")
+        self.rebuild_daily_stats(commit=False)
+
+    def _add_order_epoch(self):
+        """v5: ts_epoch mirrors timestamp as epoch seconds, so screens never parse dates"""
+        self.cursor.execute("ALTER TABLE orders ADD COLUMN ts_epoch INTEGER")
+        # 'utc' reads the stored local time and converts it, as time.mktime does
+        self.cursor.execute(
+            "UPDATE orders SET ts_epoch = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)"
+        )
+
+    def _add_order_search(self):
+        """v6: FTS5 index of customer and item names per order, kept in sync by triggers.
+
+        orders_fts rowid is the order id. SQLite builds without FTS5 skip it
+        and search_transactions falls back to LIKE.
+        """
+        try:
+            self.cursor.execute(
+                "CREATE VIRTUAL TABLE orders_fts USING fts5(customer_name, items, prefix='2 3')"
+            )
+        except sqlite3.OperationalError:
+            log.warning("SQLite has no FTS5; transaction search will use LIKE")
+            return
+        triggers = [
+            '''CREATE TRIGGER orders_fts_insert AFTER INSERT ON orders BEGIN
+                INSERT INTO orders_fts (rowid, customer_name, items) VALUES (new.id, new.customer_name, '');
+            END''',
+            '''CREATE TRIGGER orders_fts_rename AFTER UPDATE OF customer_name ON orders BEGIN
+                UPDATE orders_fts SET customer_name = new.customer_name WHERE rowid = new.id;
+            END''',
+            '''CREATE TRIGGER orders_fts_delete AFTER DELETE ON orders BEGIN
+                DELETE FROM orders_fts WHERE rowid = old.id;
+            END''',
+            '''CREATE TRIGGER orders_fts_item_insert AFTER INSERT ON order_items BEGIN
+                UPDATE orders_fts SET items = items || ' ' || new.name WHERE rowid = new.order_id;
+            END''',
+            '''CREATE TRIGGER orders_fts_item_delete AFTER DELETE ON order_items BEGIN
+                UPDATE orders_fts
+                SET items = COALESCE((SELECT group_concat(name, ' ') FROM order_items WHERE order_id = old.order_id), '')
+                WHERE rowid = old.order_id;
+            END''',
+        ]
+        for trigger in triggers:
+            self.cursor.execute(trigger)
+        self.cursor.execute("""
+            INSERT INTO orders_fts (rowid, customer_name, items)
+            SELECT o.id, o.customer_name, COALESCE(group_concat(oi.name, ' '), '')
+            FROM orders o LEFT JOIN order_items oi ON oi.order_id = o.id
+            GROUP BY o.id
+        """)
+
+    def _add_order_client_key(self):
+        """v7: client-generated idempotency key per order, unique when given"""
+        self.cursor.execute("ALTER TABLE orders ADD COLUMN client_key TEXT")
+        self.cursor.execute(
+            "CREATE UNIQUE INDEX idx_orders_client_key ON orders (client_key) WHERE client_key IS NOT NULL"
+        )
+
+    def _add_order_pricing(self):
+        """v8: discount code and amount, and the VAT share, of each order's total"""
+        self.cursor.execute("ALTER TABLE orders ADD COLUMN discount_code TEXT")
+        self.cursor.execute("ALTER TABLE orders ADD COLUMN discount REAL DEFAULT 0")
+        self.cursor.execute("ALTER TABLE orders ADD COLUMN tax REAL DEFAULT 0")
+
+    def _add_order_lifecycle(self):
+        """v9: when each order was placed, started and completed, plus the learned prep times.
+
+        `timestamp` keeps meaning the last status change (the sale time of a
+        completed order), so only the times it still holds can be backfilled.
+        """
+        for column in ('created_at', 'started_at', 'completed_at'):
+            self.cursor.execute(f"ALTER TABLE orders ADD COLUMN {column} DATETIME")
+        self.cursor.execute("UPDATE orders SET created_at = timestamp WHERE status = 'pending'")
+        self.cursor.execute("UPDATE orders SET completed_at = timestamp WHERE status = 'completed'")
+        self.cursor.execute("""
+            CREATE TABLE prep_estimates (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                minutes REAL NOT NULL,
+                samples INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+
+    MIGRATIONS = [
+        _add_order_indexes, _add_daily_stats, _add_order_scheduling, _add_order_items, _add_order_epoch,
+        _add_order_search, _add_order_client_key, _add_order_pricing, _add_order_lifecycle
+    ]
+
+    def migrate(self):
+        """Run any schema migrations this database has not seen yet"""
+        self.cursor.execute("PRAGMA user_version")
+        version = self.cursor.fetchone()[0]
+        for target, step in enumerate(self.MIGRATIONS[version:], start=version + 1):
+            step(self)
+            self.cursor.execute(f"PRAGMA user_version = {target}")
+            self.conn.commit()
+
+    def menu_catalog(self):
+        """The current MenuCatalog; only the first call reads the menu table"""
+        catalog = self._catalog
+        if catalog is None:
+            if self._pending and getattr(self._op, 'cursor', None) is None:
+                self.flush()   # queued menu rows have to be in the table first
+            catalog = self._load_catalog()
+        return catalog
+
+    @_locked
+    def _load_catalog(self):
+        # Through the writer, under its lock: a pooled reader's snapshot may
+        # predate a menu change made meanwhile, and caching that would keep
+        # the stale menu until the next change.
+        if self._catalog is None:
+            self.cursor.execute("SELECT id, name, price, category FROM menu")
+            self._catalog = MenuCatalog(
+                [{'id': r[0], 'name': r[1], 'price': r[2], 'category': r[3]} for r in self.cursor.fetchall()]
+            )
+        return self._catalog
 
     def get_menu(self):
-        self.cursor.execute("SELECT id, name, price, category FROM menu ORDER BY category, name")
-        return [{'id': r[0], 'name': r[1], 'price': r[2], 'category': r[3]} for r in self.cursor.fetchall()]
+        return [dict(m) for m in self.menu_catalog().items]
+
+    def pricing(self):
+        """PricingEngine for the current menu, rebuilt only when the menu changes.
 
+        Built from the in-memory catalog, so pricing an order never touches
+        the database (or commits a write-behind batch).
+        """
+        catalog = self.menu_catalog()
+        if self._pricing is None or self._pricing.catalog is not catalog:
+            self._pricing = PricingEngine(catalog)
+        return self._pricing
+
+    @_locked
     def add_menu_item(self, name, price, category="Main"):
-        self.cursor.execute("INSERT INTO menu (name, price, category) VALUES (?, ?, ?)", (name, price, category))
-        self.conn.commit()
+        # A NULL id lets SQLite pick one; write-behind has to know it up front
+        item_id = self._next_id('menu') if self.write_behind else None
+        self._write(
+            "INSERT INTO menu (id, name, price, category) VALUES (?, ?, ?, ?)",
+            (item_id, name, price, category)
+        )
+        self._commit()
+        item = {'id': item_id or self.cursor.lastrowid, 'name': name, 'price': price, 'category': category}
+        if self._catalog is not None:
+            self._catalog = self._catalog.with_item(item)
+        self.events.publish('menu_changed', action='added', item=item)
 
+    @_locked
     def delete_menu_item(self, item_id):
-        self.cursor.execute("DELETE FROM menu WHERE id = ?", (item_id,))
-        self.conn.commit()
+        self._write("DELETE FROM menu WHERE id = ?", (item_id,))
+        self._commit()
+        if self._catalog is not None:
+            self._catalog = self._catalog.without(item_id)
+        self.events.publish('menu_changed', action='deleted', item={'id': item_id})
+
+    # ---------- bulk import / export (see bulk_io.py) ----------
+    @_locked
+    def import_menu_items(self, items, batch_size=1000):
+        """Insert many {'name', 'price', 'category'} items in one transaction.
+
+        If `items` raises part way (e.g. a validation error), nothing is
+        kept. Returns the number of items inserted.
+        """
+        self.flush()
+        self._last_ids.pop('menu', None)
+        count = 0
+        try:
+            for batch in _batches(items, batch_size):
+                self.cursor.executemany(
+                    "INSERT INTO menu (name, price, category) VALUES (?, ?, ?)",
+                    [(m['name'], m['price'], m.get('category') or 'Main') for m in batch]
+                )
+                count += len(batch)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self._last_ids.pop('menu', None)
+        self._catalog = None
+        self.events.publish('menu_changed', action='imported', item=None)
+        return count
+
+    @_locked
+    def import_orders(self, orders, batch_size=1000):
+        """Insert many orders with their line items in one transaction.
+
+        Each order is a dict like the ones create_order takes, plus 'status'
+        and 'timestamp'. Completed orders are added to the daily rollups in
+        the same transaction. If `orders` raises part way, nothing is kept.
+        Returns the number of orders inserted.
+        """
+        self.flush()
+        catalog = self.menu_catalog()
+        self._last_ids.pop('orders', None)
+        first_id = None
+        count = 0
+        try:
+            for batch in _batches(orders, batch_size):
+                rows, lines = [], []
+                for o in batch:
+                    order_id = self._next_id('orders')
+                    first_id = first_id or order_id
+                    epoch = timestamp_to_epoch(o['timestamp'])
+                    rows.append((order_id, o.get('customer_name') or 'Guest', o['total_price'], o['status'],
+                                 o['timestamp'], epoch, o.get('priority') or 'dine-in',
+                                 o.get('promised_at'), o.get('prep_minutes'),
+                                 o['timestamp'] if o['status'] == 'pending' else None,
+                                 o['timestamp'] if o['status'] == 'completed' else None))
+                    lines.extend((order_id,) + line for line in self._resolve_items(o['items'], catalog))
+                self.cursor.executemany(
+                    "INSERT INTO orders (id, customer_name, total_price, status, timestamp, ts_epoch, "
+                    "priority, promised_at, prep_minutes, created_at, completed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                self.cursor.executemany(
+                    "INSERT INTO order_items (order_id, menu_id, name, qty, unit_price) VALUES (?, ?, ?, ?, ?)",
+                    lines
+                )
+                count += len(batch)
+            if first_id is not None:
+                self._rollup('main', min_id=first_id)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self._last_ids.pop('orders', None)
+        if count and self._analytics is not None:
+            self._analytics.clear()   # imports send no order events; reload on the next report
+        return count
+
+    def _read_only_connection(self):
+        """A connection of its own for a long scan (self.conn for :memory:)"""
+        return self.connections.open_reader()
+
+    def iter_orders(self, status=None, batch_size=5000):
+        """Every order (items included) in id order, streamed in batches.
+
+        Reads through its own read-only connection with fetchmany, so an
+        export of millions of orders holds one batch in memory and never
+        blocks the app's connection.
+        """
+        self.flush()
+        reader = self._read_only_connection()
+        try:
+            cursor = reader.cursor()
+            sql = f"""
+                SELECT o.{', o.'.join(self.ORDER_COLUMNS.split(', '))},
+                       oi.menu_id, oi.name, oi.qty, oi.unit_price
+                FROM orders o LEFT JOIN order_items oi ON oi.order_id = o.id
+            """
+            params = ()
+            if status:
+                sql += " WHERE o.status = ?"
+                params = (status,)
+            cursor.execute(sql + " ORDER BY o.id, oi.id", params)
+            carried = []   # rows of the last order of a batch, which may go on in the next one
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                rows = carried + rows
+                cut = len(rows)
+                while cut and rows[cut - 1][0] == rows[-1][0]:
+                    cut -= 1
+                yield from self._group_orders(rows[:cut])
+                carried = rows[cut:]
+            yield from self._group_orders(carried)
+        finally:
+            if reader is not self.conn:
+                reader.close()
+
+    def iter_sales(self, batch_size=20000, include_archive=False):
+        """Completed orders as flat row batches for analytics.py.
+
+        Each row is (order id, timestamp, total_price, menu_id, name, qty,
+        unit_price), one per line item, ordered by order id; archived
+        months come first when include_archive is set.
+        """
+        if include_archive:
+            for month in self.archive_months():
+                yield from self._archive(month).iter_sales(batch_size)
+        self.flush()
+        reader = self._read_only_connection()
+        try:
+            cursor = reader.cursor()
+            cursor.execute("""
+                SELECT o.id, o.timestamp, o.total_price, oi.menu_id, oi.name, oi.qty, oi.unit_price
+                FROM orders o LEFT JOIN order_items oi ON oi.order_id = o.id
+                WHERE +o.status = 'completed'
+                ORDER BY o.id
+            """)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            if reader is not self.conn:
+                reader.close()
+
+    def audit_prices(self, period, reprice=False, limit=100):
+        """Re-price every pending and completed order of a day ('YYYY-MM-DD')
+        or month ('YYYY-MM'), archive included; see PricingEngine.audit"""
+        if len(period) == 7:
+            first = date.fromisoformat(period + "-01")
+            end = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            first = date.fromisoformat(period)
+            end = first + timedelta(days=1)
+        orders = (array('q'), array('d'), [])
+        lines = (array('q'), array('q'), array('q'), array('d'))
+        sources = [self]
+        if period[:7] in self.archive_months():
+            sources.insert(0, self._archive(period[:7]))
+        for source in sources:
+            source._audit_columns(first.isoformat(), end.isoformat(), orders, lines)
+        return self.pricing().audit(orders, lines, reprice=reprice, limit=limit)
+
+    def _audit_columns(self, start, end, orders, lines):
+        """Append the audit columns of orders with start <= timestamp < end"""
+        self.flush()
+        reader = self._read_only_connection()
+        try:
+            cursor = reader.cursor()
+            where = "o.status IN ('pending', 'completed') AND o.timestamp >= ? AND o.timestamp < ?"
+            cursor.execute(f"SELECT o.id, COALESCE(o.total_price, 0), o.discount_code FROM orders o WHERE {where}",
+                           (start, end))
+            for columns, rows in zip(orders, zip(*cursor.fetchall())):
+                columns.extend(rows)
+            cursor.execute(f"""
+                SELECT oi.order_id, COALESCE(oi.menu_id, -1), oi.qty, COALESCE(oi.unit_price, -1)
+                FROM orders o JOIN order_items oi ON oi.order_id = o.id
+                WHERE {where}
+            """, (start, end))
+            while True:
+                rows = cursor.fetchmany(50000)
+                if not rows:
+                    break
+                for columns, values in zip(lines, zip(*rows)):
+                    columns.extend(values)
+        finally:
+            if reader is not self.conn:
+                reader.close()
+
+    def sales_report(self, start=None, end=None, bucket=None, top=10):
+        """Hourly, time-series, week-over-week, top-item and category sales
+        for the days start..end; see analytics.SalesAnalytics.report"""
+        if self._analytics is None:
+            from analytics import SalesAnalytics   # needs numpy, so only loaded when asked for
+            with self._lock:   # reader threads may get here together; make only one
+                if self._analytics is None:
+                    self._analytics = SalesAnalytics(self)
+        return self._analytics.report(start, end, bucket, top)
+
+    @_locked
+    def order_for_key(self, client_key):
+        """Id of the order submitted with `client_key`, or None"""
+        order_id = self._unflushed_keys.get(client_key)
+        if order_id is None:
+            self.cursor.execute("SELECT id FROM orders WHERE client_key = ?", (client_key,))
+            row = self.cursor.fetchone()
+            order_id = row[0] if row else None
+        return order_id
 
-    def create_order(self, customer_name, items, total_price):
+    @_locked
+    def create_order(self, customer_name, items, total_price, priority='dine-in', promised_at=None,
+                     prep_minutes=None, client_key=None, discount_code=None, discount=0.0, tax=0.0):
+        """Insert an order and its line items; returns its id.
+
+        A retry that passes the same `client_key` gets the first order's id
+        back and writes nothing.
+        """
+        if client_key is not None:
+            existing = self.order_for_key(client_key)
+            if existing is not None:
+                return existing
+        lines = self._resolve_items(items, self.menu_catalog())
         # Use current timestamp instead of relying on SQLite's CURRENT_TIMESTAMP
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.cursor.execute(
-            "INSERT INTO orders (customer_name, items, total_price, timestamp) VALUES (?, ?, ?, ?)",
-            (customer_name, json.dumps(items), total_price, current_time)
-        )
-        self.conn.commit()
-        return self.cursor.lastrowid
+        current_time, epoch = now_timestamp()
+        order_id = self._next_id('orders') if self.write_behind else None
+        try:
+            self._write(
+                "INSERT INTO orders (id, customer_name, total_price, timestamp, ts_epoch, priority, promised_at, "
+                "prep_minutes, client_key, discount_code, discount, tax, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (order_id, customer_name, total_price, current_time, epoch, priority, promised_at, prep_minutes,
+                 client_key, discount_code, discount, tax, current_time)
+            )
+        except sqlite3.IntegrityError:
+            # Another connection inserted the same key since the check above
+            self.conn.rollback()
+            return self.order_for_key(client_key)
+        if order_id is None:
+            order_id = self.cursor.lastrowid
+        for line in lines:
+            self._write(
+                "INSERT INTO order_items (order_id, menu_id, name, qty, unit_price) VALUES (?, ?, ?, ?, ?)",
+                (order_id,) + line
+            )
+        self._commit()
+        if self.write_behind:
+            self._unflushed[order_id] = (
+                'pending', total_price, customer_name, self._lines_to_items(lines), current_time, None
+            )
+            if client_key is not None:
+                self._unflushed_keys[client_key] = order_id
+        return order_id
+
+    def _resolve_items(self, items, catalog):
+        """(menu_id, name, qty, unit_price) rows for a list of {'name', 'qty'} items.
+
+        Items that are not on the menu keep their name with no menu id or price.
+        """
+        lines = []
+        for i in items:
+            m = catalog.find(i['name']) or {}
+            lines.append((i.get('menu_id', m.get('id')), i['name'], i['qty'], i.get('unit_price', m.get('price'))))
+        return lines
+
+    def _lines_to_items(self, lines):
+        return tuple(line_item(*line) for line in lines)
+
+    def _decode_items(self, text):
+        # Blobs written before order_items were JSON; the oldest ones were
+        # Python literals, which literal_eval reads without running code.
+        try:
+            return json.loads(text)
+        except ValueError:
+            return ast.literal_eval(text)
 
-    def get_pending_orders(self):
+    def _order_items(self, order_id):
         self.cursor.execute(
-            "SELECT id, customer_name, items, total_price, timestamp FROM orders WHERE status='pending' ORDER BY timestamp"
+            "SELECT menu_id, name, qty, unit_price FROM order_items WHERE order_id = ? ORDER BY id",
+            (order_id,)
+        )
+        return self._lines_to_items(self.cursor.fetchall())
+
+    ORDER_COLUMNS = ("id, customer_name, total_price, timestamp, priority, promised_at, prep_minutes, ts_epoch, "
+                     "created_at, started_at, status, completed_at, discount_code, discount, tax")
+
+    def _row_to_order(self, r, items=(), shared=None):
+        """Turn a row of ORDER_COLUMNS into an OrderRecord.
+
+        `shared` dedupes the strings that repeat from row to row (names,
+        priority, status), so a page of orders holds one copy of each.
+        """
+        share = (shared if shared is not None else {}).setdefault
+        return OrderRecord(
+            r[0],                                # id
+            share(r[1], r[1]),                   # customer_name
+            items,
+            r[2],                                # total_price
+            share(r[10], r[10]),                 # status
+            r[3],                                # timestamp
+            r[7],                                # ts_epoch
+            share(r[4], r[4]) or 'dine-in',      # priority
+            r[5],                                # promised_at
+            r[6],                                # prep_minutes
+            r[8],                                # created_at
+            r[9],                                # started_at
+            r[11],                               # completed_at
+            share(r[12], r[12]),                 # discount_code
+            r[13],                               # discount
+            r[14],                               # tax
         )
-        rows = self.cursor.fetchall()
-        orders = []
+
+    def _group_orders(self, rows):
+        """OrderRecords from ORDER_COLUMNS + (menu_id, name, qty, unit_price) rows,
+        one row per line item, in order id order"""
+        shared = {}
+        first, lines = None, []
         for r in rows:
-            try:
-                # Try to parse as JSON first, fall back to eval for backward compatibility
-                try:
-                    items_data = json.loads(r[2])
-                except:
-                    items_data = eval(r[2])
-                orders.append({
-                    'id': r[0], 
-                    'customer_name': r[1], 
-                    'items': items_data, 
-                    'total_price': r[3], 
-                    'timestamp': r[4]
-                })
-            except:
-                continue  # Skip corrupted orders
-        return orders
-
-    def update_order_status(self, order_id, status):
+            if first is None or r[0] != first[0]:
+                if first is not None:
+                    yield self._row_to_order(first, tuple(lines), shared)
+                first, lines = r, []
+            if r[-3] is not None:
+                line = r[-4:]
+                lines.append(_LINE_ITEMS.get(line) or line_item(*line))
+        if first is not None:
+            yield self._row_to_order(first, tuple(lines), shared)
+
+    def _query_orders(self, status, after=None, limit=None, descending=False, where=(), where_params=(),
+                      status_index=True):
+        """Keyset-paginated read of orders with the given status, items included.
+
+        Rows are ordered by (timestamp, id) so the (status, timestamp) index
+        serves both the filter and the sort. `after` is the last order of the
+        previous page; only rows strictly past it are returned. The page is
+        joined to order_items in the same query. `where` adds extra
+        conditions on orders, with their values in `where_params`; pass
+        status_index=False when those pick out few enough rows that looking
+        them up and sorting beats walking the status index.
+        """
+        status_filter = "status=?" if status_index else "+status=?"   # unary + hides the index
+        page = " AND ".join([f"SELECT {self.ORDER_COLUMNS} FROM orders WHERE {status_filter}", *where])
+        params = [status, *where_params]
+        if after is not None:
+            page += " AND (timestamp, id) %s (?, ?)" % ('<' if descending else '>')
+            params += [after['timestamp'], after['id']]
+        direction = 'DESC' if descending else 'ASC'
+        page += f" ORDER BY timestamp {direction}, id {direction}"
+        if limit is not None:
+            page += " LIMIT ?"
+            params.append(limit)
+        self.cursor.execute(f"""
+            SELECT p.*, oi.menu_id, oi.name, oi.qty, oi.unit_price
+            FROM ({page}) p LEFT JOIN order_items oi ON oi.order_id = p.id
+            ORDER BY p.timestamp {direction}, p.id {direction}, oi.id
+        """, params)
+        return list(self._group_orders(self.cursor.fetchall()))
+
+    @_reads
+    def get_pending_orders(self, after=None, limit=None):
+        """Pending orders, oldest first. Without `limit` every pending order is returned."""
+        return self._query_orders('pending', after=after, limit=limit)
+
+    @_locked
+    def update_order_status(self, order_id, status, expected_status=None):
+        """Set an order's status; returns False, changing nothing, if the order
+        is missing or `expected_status` is given and the order is not in it"""
         # Use current timestamp when updating order status
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.cursor.execute("""
+        current_time, epoch = now_timestamp()
+        previous = self._order_state(order_id)
+        if expected_status is not None and (previous is None or previous[0] != expected_status):
+            return False
+        completed_at = current_time if status == 'completed' else None
+        self._write("""
             UPDATE orders 
-            SET status = ?, timestamp = ?
+            SET status = ?, timestamp = ?, ts_epoch = ?, completed_at = COALESCE(?, completed_at)
             WHERE id = ?
-        """, (status, current_time, order_id))
-        self.conn.commit()
+        """, (status, current_time, epoch, completed_at, order_id))
+        # Roll the order into today's stats in the same transaction, once
+        if status == 'completed' and previous and previous[0] != 'completed':
+            self._defer(self._add_to_daily_stats, current_time[:10], order_id)
+        self._commit()
+        if self.write_behind and previous:
+            self._unflushed[order_id] = (status,) + tuple(previous[1:])
+
+        if previous:
+            order = OrderRecord(
+                id=order_id,
+                customer_name=previous[2],
+                items=previous[3],
+                total_price=previous[1],
+                status=status,
+                timestamp=current_time,
+                ts_epoch=epoch,
+                created_at=previous[4],
+                started_at=previous[5],
+                completed_at=completed_at
+            )
+            self.events.publish(
+                'order_status_changed', order=order, status=status, previous_status=previous[0]
+            )
+        return previous is not None
+
+    def _order_state(self, order_id):
+        """(status, total_price, customer_name, items, created_at, started_at), or None"""
+        # Orders touched since the last flush are not in the table yet
+        state = self._unflushed.get(order_id)
+        if state is None:
+            self.cursor.execute(
+                "SELECT status, total_price, customer_name, created_at, started_at FROM orders WHERE id = ?",
+                (order_id,)
+            )
+            row = self.cursor.fetchone()
+            state = row[:3] + (self._order_items(order_id),) + row[3:] if row else None
+        return state
+
+    @_locked
+    def start_order(self, order_id):
+        """Record that the kitchen started a pending order; returns the start
+        time, or None if the order is not pending or was already started"""
+        state = self._order_state(order_id)
+        if state is None or state[0] != 'pending' or state[5]:
+            return None
+        current_time, _ = now_timestamp()
+        self._write("UPDATE orders SET started_at = ? WHERE id = ?", (current_time, order_id))
+        self._commit()
+        if self.write_behind:
+            self._unflushed[order_id] = state[:5] + (current_time,)
+        self.events.publish('order_started', order_id=order_id, started_at=current_time)
+        return current_time
+
+    @_reads
+    def prep_estimates(self):
+        """Every saved (kind, key, minutes, samples) row of PrepEstimator"""
+        self.cursor.execute("SELECT kind, key, minutes, samples FROM prep_estimates")
+        return self.cursor.fetchall()
+
+    @_locked
+    def save_prep_estimates(self, rows):
+        for row in rows:
+            self._write(
+                "INSERT INTO prep_estimates (kind, key, minutes, samples) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (kind, key) DO UPDATE SET minutes = excluded.minutes, samples = excluded.samples",
+                row
+            )
+        self._commit()
+
+    # ---------- daily stats rollup ----------
+    def _add_to_daily_stats(self, day, order_id):
+        """Add one completed order to the rollups for `day`"""
+        self.cursor.execute('''
+            INSERT INTO daily_stats (day, orders, revenue)
+            SELECT ?, 1, COALESCE(total_price, 0) FROM orders WHERE id = ?
+            ON CONFLICT(day) DO UPDATE SET
+                orders = orders + excluded.orders, revenue = revenue + excluded.revenue
+        ''', (day, order_id))
+        self.cursor.execute('''
+            INSERT INTO daily_item_stats (day, name, qty, revenue)
+            SELECT ?, name, qty, qty * COALESCE(unit_price, 0) FROM order_items WHERE order_id = ?
+            ON CONFLICT(day, name) DO UPDATE SET
+                qty = qty + excluded.qty, revenue = revenue + excluded.revenue
+        ''', (day, order_id))
+        self.cursor.execute('''
+            INSERT INTO daily_category_stats (day, category, qty, revenue)
+            SELECT ?, COALESCE(m.category, 'Other'), oi.qty, oi.qty * COALESCE(oi.unit_price, 0)
+            FROM order_items oi LEFT JOIN menu m ON m.id = oi.menu_id
+            WHERE oi.order_id = ?
+            ON CONFLICT(day, category) DO UPDATE SET
+                qty = qty + excluded.qty, revenue = revenue + excluded.revenue
+        ''', (day, order_id))
+
+    @_locked
+    def rebuild_daily_stats(self, commit=True):
+        """Recompute every daily rollup from the completed orders (backfill).
+
+        With `commit` the archived months are rolled up too, one attached
+        file at a time (ATTACH is not allowed inside a transaction).
+        """
+        self.flush()
+        self.cursor.execute("DELETE FROM daily_stats")
+        self.cursor.execute("DELETE FROM daily_item_stats")
+        self.cursor.execute("DELETE FROM daily_category_stats")
+        self._rollup('main')
+        if commit:
+            self.conn.commit()
+            for month in self.archive_months():
+                self._attach_archive(month)
+                try:
+                    self._rollup('archive')
+                    self.conn.commit()
+                finally:
+                    self.cursor.execute("DETACH DATABASE archive")
+
+    def _rollup(self, schema, min_id=0):
+        """Add the completed orders in `schema` (main or an attached archive) to the rollups.
+
+        `min_id` limits it to orders from that id on, e.g. a bulk import.
+        """
+        self.cursor.execute(f'''
+            INSERT INTO main.daily_stats (day, orders, revenue)
+            SELECT DATE(timestamp), COUNT(*), COALESCE(SUM(total_price), 0)
+            FROM {schema}.orders WHERE status='completed' AND id >= {int(min_id)}
+            GROUP BY DATE(timestamp)
+            ON CONFLICT (day) DO UPDATE SET
+                orders = orders + excluded.orders, revenue = revenue + excluded.revenue
+        ''')
+        self.cursor.execute(f'''
+            INSERT INTO main.daily_item_stats (day, name, qty, revenue)
+            SELECT DATE(o.timestamp), oi.name, SUM(oi.qty), SUM(oi.qty * COALESCE(oi.unit_price, 0))
+            FROM {schema}.orders o JOIN {schema}.order_items oi ON oi.order_id = o.id
+            WHERE o.status='completed' AND o.id >= {int(min_id)}
+            GROUP BY DATE(o.timestamp), oi.name
+            ON CONFLICT (day, name) DO UPDATE SET
+                qty = qty + excluded.qty, revenue = revenue + excluded.revenue
+        ''')
+        self.cursor.execute(f'''
+            INSERT INTO main.daily_category_stats (day, category, qty, revenue)
+            SELECT DATE(o.timestamp), COALESCE(m.category, 'Other'),
+                   SUM(oi.qty), SUM(oi.qty * COALESCE(oi.unit_price, 0))
+            FROM {schema}.orders o
+            JOIN {schema}.order_items oi ON oi.order_id = o.id
+            LEFT JOIN main.menu m ON m.id = oi.menu_id
+            WHERE o.status='completed' AND o.id >= {int(min_id)}
+            GROUP BY DATE(o.timestamp), COALESCE(m.category, 'Other')
+            ON CONFLICT (day, category) DO UPDATE SET
+                qty = qty + excluded.qty, revenue = revenue + excluded.revenue
+        ''')
 
+    @_reads
     def get_today_stats(self):
         today = date.today().isoformat()
-        self.cursor.execute('''
-            SELECT COUNT(*), COALESCE(SUM(total_price),0)
-            FROM orders
-            WHERE status='completed' AND DATE(timestamp)=?
-        ''', (today,))
-        count, revenue = self.cursor.fetchone()
+        self.cursor.execute("SELECT orders, revenue FROM daily_stats WHERE day = ?", (today,))
+        count, revenue = self.cursor.fetchone() or (0, 0.0)
         avg = revenue / count if count and count > 0 else 0.0
         return {'orders': count or 0, 'revenue': revenue, 'avg': avg}
+
+    @_reads
+    def get_item_stats(self, day=None):
+        """Quantity and revenue per menu item for one day (default today)"""
+        day = day or date.today().isoformat()
+        self.cursor.execute(
+            "SELECT name, qty, revenue FROM daily_item_stats WHERE day = ? ORDER BY qty DESC",
+            (day,)
+        )
+        return [{'name': r[0], 'qty': r[1], 'revenue': r[2]} for r in self.cursor.fetchall()]
+
+    @_reads
+    def get_category_stats(self, day=None):
+        """Quantity and revenue per menu category for one day (default today)"""
+        day = day or date.today().isoformat()
+        self.cursor.execute(
+            "SELECT category, qty, revenue FROM daily_category_stats WHERE day = ? ORDER BY revenue DESC",
+            (day,)
+        )
+        return [{'category': r[0], 'qty': r[1], 'revenue': r[2]} for r in self.cursor.fetchall()]
+
+    # ---------- item reports ----------
+    def _item_totals(self, start, end, order_by, limit):
+        # From the daily rollup rather than the orders, so archived days count
+        sql = f'''
+            SELECT name, SUM(qty) AS qty, SUM(revenue) AS revenue
+            FROM daily_item_stats
+            WHERE day >= ? AND day < ?
+            GROUP BY name
+            ORDER BY {order_by} DESC
+        '''
+        # Dates are 'YYYY-MM-DD'; `end` is exclusive
+        params = [start or '0000-00-00', end or '9999-99-99']
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        self.cursor.execute(sql, params)
+        return [{'name': r[0], 'qty': r[1], 'revenue': r[2]} for r in self.cursor.fetchall()]
+
+    @_reads
+    def get_best_sellers(self, start=None, end=None, limit=10):
+        """Items ranked by quantity sold in completed orders between `start` and `end`"""
+        return self._item_totals(start, end, 'qty', limit)
+
+    @_reads
+    def get_item_revenue(self, start=None, end=None, limit=None):
+        """Items ranked by revenue (quantity x price at time of sale) between `start` and `end`"""
+        return self._item_totals(start, end, 'revenue', limit)
     
-    def get_transactions(self):
+    @_reads
+    def get_transactions(self, after=None, limit=None, include_archive=False):
+        """Completed orders, newest first.
+
+        Pass `limit` to fetch one page and the last order of that page as
+        `after` to fetch the next one, e.g.
+        ``page = db.get_transactions(after=page[-1], limit=50)``.
+        With `include_archive` the pages carry on into the archived months
+        once the hot table runs out.
+        """
+        page = self._query_orders('completed', after=after, limit=limit, descending=True)
+        if include_archive:
+            page += self._archived_page('get_transactions', after, limit, len(page))
+        return page
+
+    SEARCH_SORT_LIMIT = 2000   # matches few enough to fetch by id and sort
+
+    def _has_search_index(self):
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'orders_fts'")
+        return self.cursor.fetchone() is not None
+
+    @_reads
+    def search_transactions(self, text="", start=None, end=None, min_total=None, max_total=None,
+                            after=None, limit=50, include_archive=False):
+        """Completed orders matching a search, newest first, paginated like get_transactions.
+
+        Every word in `text` must prefix-match the customer name or an item
+        name, so "maria cal" finds Maria Santos' Beef Caldereta orders.
+        `start` and `end` are inclusive 'YYYY-MM-DD' days; `min_total` and
+        `max_total` bound total_price. `include_archive` works as for
+        get_transactions.
+        """
+        search = {'text': text, 'start': start, 'end': end, 'min_total': min_total, 'max_total': max_total}
+        page = self._search_hot(after=after, limit=limit, **search)
+        if include_archive:
+            page += self._archived_page('search_transactions', after, limit, len(page), **search)
+        return page
+
+    def _search_hot(self, text, start, end, min_total, max_total, after, limit):
+        where, params = [], []
+        status_index = True
+        words = re.findall(r"\w+", text or "")
+        if words and self._has_search_index():
+            match = " ".join(f'"{w}"*' for w in words)
+            self.cursor.execute("SELECT rowid FROM orders_fts WHERE orders_fts MATCH ? LIMIT ?",
+                                (match, self.SEARCH_SORT_LIMIT))
+            ids = [r[0] for r in self.cursor.fetchall()]
+            if not ids:
+                return []
+            if len(ids) < self.SEARCH_SORT_LIMIT:
+                # Rare words: fetch the matches by id and sort them
+                where.append("id IN (%s)" % ",".join(map(str, ids)))
+                status_index = False
+            else:
+                # Common words: walk the history newest first, keeping matches
+                where.append("id IN (SELECT rowid FROM orders_fts WHERE orders_fts MATCH ?)")
+                params.append(match)
+        for w in ([] if not words or where else words):
+            where.append("(customer_name LIKE ? OR EXISTS "
+                         "(SELECT 1 FROM order_items oi WHERE oi.order_id = orders.id AND oi.name LIKE ?))")
+            params += [f"%{w}%", f"%{w}%"]
+        if start:
+            where.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            where.append("timestamp < date(?, '+1 day')")
+            params.append(end)
+        if min_total is not None:
+            where.append("total_price >= ?")
+            params.append(min_total)
+        if max_total is not None:
+            where.append("total_price <= ?")
+            params.append(max_total)
+        return self._query_orders('completed', after=after, limit=limit, descending=True,
+                                  where=where, where_params=params, status_index=status_index)
+
+    # ---------- archive ----------
+    def archive_months(self):
+        """'YYYY-MM' of every archive file, oldest first"""
+        if not self.archive_dir or not os.path.isdir(self.archive_dir):
+            return []
+        names = (self._ARCHIVE_FILE.match(name) for name in os.listdir(self.archive_dir))
+        return sorted(match.group(1) for match in names if match)
+
+    def _archive(self, month):
+        """The archive Database for a month, created on first use"""
+        with self._lock:   # reads of several threads may reach here at once
+            if month not in self._archives:
+                os.makedirs(self.archive_dir, exist_ok=True)
+                self._archives[month] = Database(os.path.join(self.archive_dir, f"{month}.db"), archive_dir=False)
+            return self._archives[month]
+
+    def _attach_archive(self, month):
+        self._archive(month)   # makes sure the file exists with the current schema
+        self.cursor.execute("ATTACH DATABASE ? AS archive", (os.path.join(self.archive_dir, f"{month}.db"),))
+
+    def _archived_page(self, name, after, limit, found, **search):
+        """Continue a newest-first page from the hot table into the archive.
+
+        Completed orders are archived by age and each file holds one month,
+        so every archived order is older than every hot one and the months
+        can simply be read newest first until the page is full.
+        """
+        page = []
+        for month in reversed(self.archive_months()):
+            wanted = None if limit is None else limit - found - len(page)
+            if wanted is not None and wanted <= 0:
+                break
+            if after is not None and month > after['timestamp'][:7]:
+                continue
+            if search.get('end') and month > search['end'][:7]:
+                continue
+            if search.get('start') and month < search['start'][:7]:
+                break
+            page += getattr(self._archive(month), name)(after=after, limit=wanted, **search)
+        return page
+
+    @_locked
+    def archive_orders(self, older_than_days=None):
+        """Move completed orders older than the horizon into the monthly archive files.
+
+        Each month is copied and deleted in one transaction across both
+        files; the copy is INSERT OR IGNORE, so re-running after a crash is
+        safe. Returns the number of orders moved.
+        """
+        if not self.archive_dir:
+            return 0
+        self.flush()
+        days = self.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+        cutoff = (date.today() - timedelta(days=days)).isoformat()
         self.cursor.execute(
-            "SELECT id, customer_name, items, total_price, timestamp FROM orders WHERE status='completed' ORDER BY timestamp DESC"
+            "SELECT DISTINCT substr(timestamp, 1, 7) FROM orders WHERE status='completed' AND timestamp < ?",
+            (cutoff,)
         )
-        rows = self.cursor.fetchall()
-        transactions = []
-        for r in rows:
+        months = [r[0] for r in self.cursor.fetchall()]
+        order_columns = ", ".join(r[1] for r in self.cursor.execute("PRAGMA main.table_info(orders)").fetchall())
+        item_columns = ", ".join(r[1] for r in self.cursor.execute("PRAGMA main.table_info(order_items)").fetchall())
+
+        moved = 0
+        for month in months:
+            # Whole month, but never past the cutoff
+            where = "status='completed' AND timestamp >= ? AND timestamp < ? AND timestamp < ?"
+            params = (f"{month}-00", f"{month}-32", cutoff)
+            self._attach_archive(month)
             try:
-                # Try to parse as JSON first, fall back to eval for backward compatibility
-                try:
-                    items_data = json.loads(r[2])
-                except:
-                    items_data = eval(r[2])
-                transactions.append({
-                    'id': r[0], 
-                    'customer_name': r[1], 
-                    'items': items_data, 
-                    'total_price': r[3], 
-                    'timestamp': r[4]
-                })
-            except:
-                continue  # Skip corrupted transactions
-        return transactions
+                self.cursor.execute(
+                    f"INSERT OR IGNORE INTO archive.orders ({order_columns}) "
+                    f"SELECT {order_columns} FROM main.orders WHERE {where}", params
+                )
+                self.cursor.execute(
+                    f"INSERT OR IGNORE INTO archive.order_items ({item_columns}) "
+                    f"SELECT {item_columns} FROM main.order_items "
+                    f"WHERE order_id IN (SELECT id FROM main.orders WHERE {where})", params
+                )
+                self.cursor.execute(
+                    f"DELETE FROM main.order_items WHERE order_id IN (SELECT id FROM main.orders WHERE {where})",
+                    params
+                )
+                self.cursor.execute(f"DELETE FROM main.orders WHERE {where}", params)
+                moved += self.cursor.rowcount
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+            finally:
+                self.cursor.execute("DETACH DATABASE archive")
+        return moved
 
 
 # ==================== ORDER QUEUE ====================
+# Minutes ahead of the usual start time each priority class gets, so a VIP
+# ticket is cooked before a takeout promised for the same time.
+PRIORITY_LEAD_MINUTES = {'vip': 15, 'dine-in': 5, 'takeout': 0}
+DEFAULT_PROMISE_MINUTES = 30
+DEFAULT_PREP_MINUTES = 10
+DEFAULT_GAP_MINUTES = 5      # minutes between finished orders, until learned
+IDLE_GAP_MINUTES = 30       # a longer gap means the kitchen was idle, not slow
+PREP_SMOOTHING = 0.2        # weight of the newest sample in each moving average
+
+
+def schedule_key(order):
+    """Sort key of a pending order: (start-by time, id).
+
+    The start-by time is the promised time minus the estimated prep time and
+    the priority lead. Orders without a promised time (e.g. from before the
+    scheduler existed) are due DEFAULT_PROMISE_MINUTES after they were placed.
+    """
+    promised = timestamp_to_epoch(order.get('promised_at'))
+    if promised is None:
+        placed = order.get('ts_epoch') or timestamp_to_epoch(order['timestamp']) or 0
+        promised = placed + DEFAULT_PROMISE_MINUTES * 60
+    prep = order.get('prep_minutes') or DEFAULT_PREP_MINUTES
+    lead = PRIORITY_LEAD_MINUTES.get(order.get('priority'), 0)
+    return (promised - (prep + lead) * 60, order['id'])
+
+
+class KitchenScheduler:
+    """Indexed binary min-heap of pending orders ordered by schedule_key.
+
+    `_pos` maps each order id to its slot in the heap, so any order can be
+    completed or cancelled in O(log n), not just the one at the top.
+    """
+    def __init__(self, orders=()):
+        self._heap = []   # [key, order] pairs
+        self._pos = {}
+        for order in orders:
+            self.push(order)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, order_id):
+        return order_id in self._pos
+
+    def get(self, order_id):
+        pos = self._pos.get(order_id)
+        return self._heap[pos][1] if pos is not None else None
+
+    def push(self, order):
+        """Insert an order - O(log n)"""
+        self._heap.append([schedule_key(order), order])
+        self._pos[order['id']] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def pop(self):
+        """Remove and return the order that should be cooked next - O(log n)"""
+        if not self._heap:
+            return None
+        return self.remove(self._heap[0][1]['id'])
+
+    def remove(self, order_id):
+        """Remove any order by id - O(log n). Returns None if it is not queued."""
+        pos = self._pos.pop(order_id, None)
+        if pos is None:
+            return None
+        order = self._heap[pos][1]
+        last = self._heap.pop()
+        if pos < len(self._heap):
+            self._heap[pos] = last
+            self._pos[last[1]['id']] = pos
+            self._sift_up(pos)
+            self._sift_down(self._pos[last[1]['id']])
+        return order
+
+    def peek(self, n=1):
+        """The next `n` orders in schedule order without removing them - O(n log n)"""
+        result = []
+        frontier = [(self._heap[0][0], 0)] if self._heap else []
+        while frontier and len(result) < n:
+            _, i = heapq.heappop(frontier)
+            result.append(self._heap[i][1])
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self._heap):
+                    heapq.heappush(frontier, (self._heap[child][0], child))
+        return result
+
+    def ordered(self):
+        """Every queued order in schedule order"""
+        return [order for _, order in sorted(self._heap, key=lambda entry: entry[0])]
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i][1]['id']] = i
+        self._pos[heap[j][1]['id']] = j
+
+    def _sift_up(self, i):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._heap[i][0] >= self._heap[parent][0]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        size = len(self._heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < size and self._heap[child][0] < self._heap[smallest][0]:
+                    smallest = child
+            if smallest == i:
+                break
+            self._swap(i, smallest)
+            i = smallest
+
+
+class PrepEstimator:
+    """Prep-time and arrival estimates learned from orders as they finish.
+
+    Every estimate is an exponential moving average, so one completed order
+    updates a few numbers in O(1) and nothing is ever re-read from history:
+      ('item', name)      minutes to cook an order containing that item
+      ('gap', hour)       minutes between completions while the kitchen is busy
+      ('arrivals', hour)  orders placed in that hour of the day
+    An order's cook time runs from started_at if the kitchen marked it
+    started, else from when it was placed or the previous order was done,
+    whichever is later (a one-cook queue).
+    """
+    def __init__(self, rows=(), events=None, save=None):
+        self._lock = threading.Lock()
+        self.estimates = {(kind, key): [minutes, samples] for kind, key, minutes, samples in rows}
+        self._save = save
+        self._last_done = None   # epoch of the last completion seen
+        # Arrivals are counted per absolute hour (epoch // 3600). The hour
+        # the app started in is only partly seen, so it is never folded in.
+        self._first_hour = self._arrival_hour = int(time.time()) // 3600
+        self._arrivals = 0
+        if events is not None:
+            events.subscribe('order_status_changed', self.on_order_status_changed)
+            events.subscribe('order_added', self.on_order_added)
+
+    def _update(self, kind, key, value):
+        """Fold one sample into an average; early samples weigh more until there are enough"""
+        entry = self.estimates.get((kind, key))
+        if entry is None:
+            entry = self.estimates[(kind, key)] = [value, 0]
+        entry[1] += 1
+        entry[0] += (value - entry[0]) * max(PREP_SMOOTHING, 1 / entry[1])
+        return (kind, key, entry[0], entry[1])
+
+    def estimate(self, kind, key, default=None):
+        entry = self.estimates.get((kind, str(key)))
+        return entry[0] if entry else default
+
+    def on_order_status_changed(self, order, status, previous_status):
+        if status != 'completed' or previous_status == 'completed':
+            return
+        done = order.get('ts_epoch') or time.time()
+        started = timestamp_to_epoch(order.get('started_at'))
+        hour = str(time.localtime(done).tm_hour)
+        changed = []
+        with self._lock:
+            last_done, self._last_done = self._last_done, done
+            if started is None:
+                created = timestamp_to_epoch(order.get('created_at'))
+                started = max(created, last_done) if created and last_done else created
+            # Under a minute is a ticket closed by mistake or in bulk, not a cook time
+            if started is not None and done - started >= 60:
+                minutes = (done - started) / 60
+                for name in {i['name'] for i in order['items']}:
+                    changed.append(self._update('item', name, minutes))
+            if last_done is not None and 0 < done - last_done <= IDLE_GAP_MINUTES * 60:
+                changed.append(self._update('gap', hour, (done - last_done) / 60))
+        if changed and self._save:
+            self._save(changed)
+
+    def on_order_added(self, order):
+        placed = order.get('ts_epoch') or time.time()
+        changed = []
+        with self._lock:
+            hour = int(placed) // 3600
+            if hour > self._arrival_hour:
+                # Close the hour just ended, and count the empty ones since as 0
+                for past in range(self._arrival_hour, min(hour, self._arrival_hour + 24)):
+                    if past != self._first_hour:
+                        count = self._arrivals if past == self._arrival_hour else 0
+                        changed.append(self._update('arrivals', str(time.localtime(past * 3600).tm_hour), count))
+                self._arrival_hour, self._arrivals = hour, 0
+            if hour == self._arrival_hour:
+                self._arrivals += 1
+        if changed and self._save:
+            self._save(changed)
+
+    def prep_minutes(self, items):
+        """Expected cook time of an order: its slowest item"""
+        known = [self.estimate('item', i['name']) for i in items]
+        known = [m for m in known if m is not None]
+        return round(max(known), 1) if known else DEFAULT_PREP_MINUTES
+
+    def gap_minutes(self, epoch):
+        return self.estimate('gap', time.localtime(epoch).tm_hour, DEFAULT_GAP_MINUTES)
+
+    def etas(self, orders, now=None):
+        """order id -> epoch it should be ready, for pending orders in schedule order.
+
+        A started order is ready once its prep time has passed; a waiting
+        one also has to wait for its turn, one gap per order ahead of it.
+        """
+        now = now or time.time()
+        gap = self.gap_minutes(now) * 60
+        etas = {}
+        for position, order in enumerate(orders):
+            started = timestamp_to_epoch(order.get('started_at'))
+            own = (started or now) + (order.get('prep_minutes') or DEFAULT_PREP_MINUTES) * 60
+            etas[order['id']] = own if started else max(own, now + (position + 1) * gap)
+        return etas
+
+    def forecast(self, depth, hours=3, now=None):
+        """Expected queue length at the end of each of the next `hours` hours"""
+        now = now or time.time()
+        result = []
+        hour_start = int(now) // 3600 * 3600
+        for h in range(hours):
+            start = hour_start + h * 3600
+            share = (start + 3600 - now) / 3600 if h == 0 else 1.0   # what is left of this hour
+            arrivals = self.estimate('arrivals', time.localtime(start).tm_hour, 0)
+            served = 60 / self.gap_minutes(start)
+            depth = max(0.0, depth + (arrivals - served) * share)
+            result.append((start + 3600, depth))
+        return result
+
+
 class OrderQueue:
+    """Pending orders in the scheduler's order, mirroring the database.
+
+    The database is the record: every change is committed first and only
+    then applied in memory, so a crash at any point leaves at worst a stale
+    in-memory queue, and load_orders rebuilds it from the pending rows.
+    """
     def __init__(self, database):
         self.db = database
-        self.queue = deque()
+        self.queue = KitchenScheduler()
+        # The UI thread and the DB worker both use the queue
+        self._lock = threading.RLock()
+        self._submit_lock = threading.Lock()   # one client_key check-and-insert at a time
+        self.estimator = PrepEstimator(database.prep_estimates(), database.events,
+                                       save=database.save_prep_estimates)
         self.load_orders()
 
     def load_orders(self):
-        """Load pending orders from database"""
-        self.queue = deque(self.db.get_pending_orders())
+        """Reconcile the queue with the pending orders in the database.
+
+        On startup this is the crash recovery: one indexed read of the
+        pending rows. Later calls also announce orders that appeared or went
+        away behind the queue's back.
+        """
+        orders = self.db.get_pending_orders()
+        with self._lock:
+            old, self.queue = self.queue, KitchenScheduler(orders)
+        for order in orders:
+            if order['id'] not in old:
+                self.db.events.publish('order_added', order=order)
+        for order in old.ordered():
+            if order['id'] not in self.queue:
+                self.db.events.publish('order_removed', order=order)
 
     def enqueue(self, order_data):
-        # Add current timestamp to order data
-        current_time = datetime.now()
-        order_data['timestamp'] = current_time.strftime("%Y-%m-%d %H:%M:%S")
-        
-        order_id = self.db.create_order(
-            customer_name=order_data.get('customer_name', 'Guest'),
-            items=order_data['items'],
-            total_price=order_data['total_price']
-        )
-        # Add the order to queue with proper timestamp
-        order_data['id'] = order_id
-        self.queue.append(order_data)
-        return order_id
+        """Store a new order and schedule it.
+
+        The total is priced from the menu (PricingEngine), never taken from
+        the caller; items may list 'modifiers'. Optional keys: 'priority'
+        ('vip', 'dine-in' or 'takeout'), 'promised_at' ("%Y-%m-%d %H:%M:%S"),
+        'prep_minutes' (learned by PrepEstimator if not given),
+        'discount_code' (see DISCOUNT_RATES) and
+        'client_key', an id the submitting terminal picks so that a retried
+        submit returns the first order's id instead of adding a second one.
+        """
+        priority = order_data.setdefault('priority', 'dine-in')
+        if priority not in PRIORITY_LEAD_MINUTES:
+            raise ValueError(f"Unknown priority: {priority}")
+        client_key = order_data.get('client_key')
+        with self._submit_lock:
+            if client_key is not None:
+                existing = self.db.order_for_key(client_key)
+                if existing is not None:
+                    return existing
+
+            quote = self.db.pricing().price_order(order_data['items'], order_data.get('discount_code'))
+            claimed = order_data.get('total_price')
+            if claimed is not None and abs(claimed - quote['total_price']) > 0.005:
+                log.warning("Order total %.2f replaced by the menu price %.2f", claimed, quote['total_price'])
+            for key in ('items', 'total_price', 'discount_code', 'discount', 'tax'):
+                order_data[key] = quote[key]
+
+            # Add current timestamp to order data
+            order_data['timestamp'], order_data['ts_epoch'] = now_timestamp()
+            order_data['created_at'], order_data['started_at'] = order_data['timestamp'], None
+            if not order_data.get('promised_at'):
+                promised = time.localtime(order_data['ts_epoch'] + DEFAULT_PROMISE_MINUTES * 60)
+                order_data['promised_at'] = time.strftime(TIMESTAMP_FORMAT, promised)
+            order_data.setdefault('prep_minutes', self.estimator.prep_minutes(order_data['items']))
+            order_data.setdefault('customer_name', 'Guest')
+
+            order_id = self.db.create_order(
+                customer_name=order_data['customer_name'],
+                items=order_data['items'],
+                total_price=order_data['total_price'],
+                priority=priority,
+                promised_at=order_data['promised_at'],
+                prep_minutes=order_data['prep_minutes'],
+                client_key=client_key,
+                discount_code=order_data['discount_code'],
+                discount=order_data['discount'],
+                tax=order_data['tax']
+            )
+            # Add the order to queue with proper timestamp
+            order_data['id'] = order_id
+            order_data['status'] = 'pending'
+            order = OrderRecord.from_dict(order_data)
+            with self._lock:
+                self.queue.push(order)
+            self.db.events.publish('order_added', order=order)
+            return order_id
 
     def dequeue(self):
-        if not self.queue:
+        """Complete the order the scheduler says to cook next"""
+        with self._lock:
+            top = self.queue.peek(1)
+        return self.complete(top[0]['id']) if top else None
+
+    def start(self, order_id):
+        """Mark a queued order as being cooked; returns the start time or None"""
+        started = self.db.start_order(order_id)
+        if started is not None:
+            with self._lock:
+                order = self.queue.get(order_id)
+                if order is not None:
+                    order['started_at'] = started
+        return started
+
+    def complete(self, order_id):
+        """Mark any queued order completed - O(log n)"""
+        return self._finish(order_id, 'completed')
+
+    def cancel(self, order_id):
+        """Drop any queued order without counting it as a sale - O(log n)"""
+        return self._finish(order_id, 'cancelled')
+
+    def _finish(self, order_id, status):
+        with self._lock:
+            order = self.queue.get(order_id)
+        if order is None:
             return None
-        order = self.queue.popleft()
-        self.db.update_order_status(order['id'], 'completed')
-        return order
+        # Commit first: if this raises, the order is still queued. The
+        # status check makes a repeated complete/cancel a no-op.
+        finished = self.db.update_order_status(order_id, status, expected_status='pending')
+        with self._lock:
+            removed = self.queue.remove(order_id)
+        if removed is not None:
+            self.db.events.publish('order_removed', order=removed)
+        return order if finished else None
+
+    def peek(self, n=1):
+        """The next `n` orders to cook, without removing them"""
+        with self._lock:
+            return self.queue.peek(n)
 
     def get_all(self):
-        return list(self.queue)
+        with self._lock:
+            return self.queue.ordered()
 
     def size(self):
         return len(self.queue)
 
+    def etas(self):
+        """order id -> epoch each pending order should be ready"""
+        return self.estimator.etas(self.get_all())
+
+    def forecast(self, hours=3):
+        """(end of hour epoch, expected pending orders) for the next few hours"""
+        return self.estimator.forecast(self.size(), hours)
+
     def refresh(self):
         """Force reload from DB"""
         self.load_orders()
 
 
+class PrepBoard:
+    """How much of each item the pending orders still need, kept live.
+
+    Follows 'order_added' and 'order_removed', so each order costs one pass
+    over its own lines when it arrives and when it leaves, and the board
+    never re-reads the queue. Orders are remembered by id, so an event
+    delivered twice (a resync, say) cannot count an order twice.
+    """
+    def __init__(self, order_queue, events):
+        self._lock = threading.Lock()
+        self.qty = {}       # item name -> portions to cook
+        self.tickets = {}   # item name -> pending orders that include it
+        self._orders = {}   # order id -> its (name, qty) lines, as counted
+        self.version = 0
+        events.subscribe('order_added', self.on_order_added)
+        events.subscribe('order_removed', self.on_order_removed)
+        for order in order_queue.get_all():
+            self.on_order_added(order)
+
+    def on_order_added(self, order):
+        lines = [(i['name'], i['qty']) for i in order['items']]
+        with self._lock:
+            if order['id'] in self._orders:
+                return
+            self._orders[order['id']] = lines
+            for name in {name for name, _ in lines}:
+                self.tickets[name] = self.tickets.get(name, 0) + 1
+            for name, qty in lines:
+                self.qty[name] = self.qty.get(name, 0) + qty
+            self.version += 1
+
+    def on_order_removed(self, order):
+        with self._lock:
+            lines = self._orders.pop(order['id'], None)
+            if lines is None:
+                return
+            for name in {name for name, _ in lines}:
+                self.tickets[name] -= 1
+            for name, qty in lines:
+                self.qty[name] -= qty
+                if self.qty[name] <= 0:
+                    del self.qty[name]
+                    self.tickets.pop(name, None)
+            self.version += 1
+
+    def rows(self):
+        """(name, qty, tickets) for every item still to cook, most first"""
+        with self._lock:
+            rows = [(name, qty, self.tickets[name]) for name, qty in self.qty.items()]
+        return sorted(rows, key=lambda row: (-row[1], row[0]))
+
+
+# ==================== DB WORKER ====================
+class DatabaseWorker:
+    """Runs Database calls off the Kivy main thread.
+
+    `submit` returns a concurrent.futures.Future. If `on_result` or
+    `on_error` is given, it is called back on the main thread through
+    Clock.schedule_once, so screens can show a loading state and fill in
+    later without the frame loop ever waiting on SQLite.
+
+    Writes run one at a time, in order, on one thread. Calls that only
+    read (history, stats, reports) go through `read` to their own threads,
+    so a long report never queues up the next order behind it.
+    """
+    def __init__(self, max_workers=1, read_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="db-reader")
+
+    def submit(self, fn, *args, on_result=None, on_error=None, **kwargs):
+        return self._submit(self._executor, fn, args, kwargs, on_result, on_error)
+
+    def read(self, fn, *args, on_result=None, on_error=None, **kwargs):
+        """Like submit, for calls that do not write"""
+        return self._submit(self._readers, fn, args, kwargs, on_result, on_error)
+
+    def _submit(self, executor, fn, args, kwargs, on_result, on_error):
+        if PROFILER.enabled:
+            fn = self._timed(fn)
+        future = executor.submit(fn, *args, **kwargs)
+        if on_result or on_error:
+            future.add_done_callback(
+                lambda f: Clock.schedule_once(lambda dt: self._deliver(f, on_result, on_error))
+            )
+        return future
+
+    @staticmethod
+    def _timed(fn):
+        """Time the call on the worker thread, queue wait excluded"""
+        name = getattr(fn, '__name__', repr(fn))
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                PROFILER.record('db', name, time.perf_counter() - start)
+        return call
+
+    def _deliver(self, future, on_result, on_error):
+        error = future.exception()
+        if error is None:
+            if on_result:
+                on_result(future.result())
+        elif on_error:
+            on_error(error)
+        else:
+            log.error("Database call failed", exc_info=error)
+
+    def shutdown(self):
+        """Finish queued calls and stop the worker threads"""
+        self._readers.shutdown(wait=True)
+        self._executor.shutdown(wait=True)
+
+
+# ==================== ORDER SERVICE CLIENT ====================
+class OrderServiceClient:
+    """Calls order_server.py over a small pool of keep-alive HTTP connections.
+
+    Each DB worker thread borrows a connection for one call and hands it
+    back, so a terminal pays the TCP setup once rather than on every order.
+    """
+    def __init__(self, url, pool_size=4, timeout=10):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._pool = LifoQueue()
+
+    def connect(self, timeout=None):
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout or self.timeout)
+
+    def call(self, target, name, *args, **kwargs):
+        """Run `target.name(*args, **kwargs)` on the server and return its result"""
+        body = json.dumps({'args': args, 'kwargs': kwargs}, default=to_plain)
+        while True:
+            try:
+                conn, reused = self._pool.get_nowait(), True
+            except Empty:
+                conn, reused = self.connect(), False
+            try:
+                conn.request("POST", f"/{target}/{name}", body, {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                reply = json.loads(response.read() or b'{}')
+                break
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if not reused:
+                    raise
+                # The server closed this idle connection; try a fresh one
+        if self._pool.qsize() < self.pool_size:
+            self._pool.put(conn)
+        else:
+            conn.close()
+        if response.status == 400:
+            raise ValueError(reply.get('error'))
+        if response.status != 200:
+            raise RuntimeError(f"Order service {target}.{name} failed: {reply.get('error')}")
+        return reply.get('result')
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Empty:
+                break
+
+
+class RemoteDatabase:
+    """Database stand-in that forwards every call to the order service.
+
+    Events pushed by the service are republished on the local EventBus, so
+    screens subscribe exactly as they do to a local Database.
+    """
+    CALLS = {
+        'get_menu', 'add_menu_item', 'delete_menu_item',
+        'create_order', 'update_order_status', 'get_pending_orders',
+        'get_transactions', 'search_transactions',
+        'get_today_stats', 'get_item_stats', 'get_category_stats', 'get_best_sellers', 'get_item_revenue',
+        'sales_report', 'prep_estimates',
+    }
+    ORDER_CALLS = {'get_pending_orders', 'get_transactions', 'search_transactions'}   # lists of orders
+    RECONNECT_SECONDS = 2
+
+    def __init__(self, url, events=None):
+        self.events = events or EventBus()
+        self.client = OrderServiceClient(url)
+        self._catalog = None
+        self._pricing = None
+        self.events.subscribe('menu_changed', lambda **payload: setattr(self, '_catalog', None))
+        self._closing = threading.Event()
+        self._listener = threading.Thread(target=self._listen, name="order-service-events", daemon=True)
+        self._listener.start()
+
+    def __getattr__(self, name):
+        if name in self.ORDER_CALLS:
+            call = functools.partial(self.client.call, 'db', name)
+            return lambda *args, **kwargs: [OrderRecord.from_dict(o) for o in call(*args, **kwargs)]
+        if name in self.CALLS:
+            return functools.partial(self.client.call, 'db', name)
+        raise AttributeError(name)
+
+    def menu_catalog(self):
+        if self._catalog is None:
+            reply = self.client.call('db', 'menu_catalog')
+            self._catalog = MenuCatalog(reply['items'], reply['version'])
+        return self._catalog
+
+    def pricing(self):
+        """PricingEngine over the cached menu; the service reprices every order anyway"""
+        catalog = self.menu_catalog()
+        if self._pricing is None or self._pricing.catalog is not catalog:
+            self._pricing = PricingEngine(catalog)
+        return self._pricing
+
+    def flush(self):
+        """Writes are committed by the service"""
+
+    def _listen(self):
+        """Follow the service's event stream, reconnecting until close()"""
+        while not self._closing.is_set():
+            conn = self.client.connect(timeout=60)   # the server sends a keep-alive every 15s
+            try:
+                conn.request("GET", "/events")
+                response = conn.getresponse()
+                self._catalog = None
+                self.events.publish('service_connected')
+                event, data = None, []
+                while not self._closing.is_set():
+                    line = response.readline()
+                    if not line:
+                        break
+                    line = line.decode().rstrip('\r\n')
+                    if line.startswith('event:'):
+                        event = line[6:].strip()
+                    elif line.startswith('data:'):
+                        data.append(line[5:].strip())
+                    elif not line and event:
+                        payload = json.loads("\n".join(data))
+                        if 'order' in payload:
+                            payload['order'] = OrderRecord.from_dict(payload['order'])
+                        self.events.publish(event, **payload)
+                        event, data = None, []
+            except (http.client.HTTPException, OSError) as error:
+                log.warning("Order service event stream lost: %s", error)
+            finally:
+                conn.close()
+            self._closing.wait(self.RECONNECT_SECONDS)
+
+    def close(self):
+        self._closing.set()
+        self.client.close()
+
+
+class RemoteOrderQueue:
+    """OrderQueue for a terminal: the queue lives in the order service.
+
+    Writes go to the service; reads come from a local KitchenScheduler kept
+    current by the pushed order_added/order_removed events, so peeking at the
+    queue never waits on the network.
+    """
+    SUBMIT_ATTEMPTS = 3
+    RETRY_SECONDS = 0.2   # doubled after each failed attempt
+
+    def __init__(self, database):
+        self.db = database
+        self.queue = KitchenScheduler()
+        self._lock = threading.RLock()
+        database.events.subscribe('order_added', self._on_order_added)
+        database.events.subscribe('order_removed', self._on_order_removed)
+        database.events.subscribe('order_started', self._on_order_started)
+        database.events.subscribe('service_connected', self.resync)
+        # Learns from the pushed events too; the service saves its own copy
+        self.estimator = PrepEstimator(database.prep_estimates(), database.events)
+        self.load_orders()
+
+    def _fetch_all(self):
+        return [OrderRecord.from_dict(o) for o in self.db.client.call('queue', 'get_all')]
+
+    def load_orders(self):
+        orders = self._fetch_all()
+        with self._lock:
+            self.queue = KitchenScheduler(orders)
+
+    def resync(self):
+        """Reload after a reconnect and report what changed while the stream was down"""
+        try:
+            orders = self._fetch_all()
+        except (ConnectionError, OSError, RuntimeError):
+            return  # the next reconnect tries again
+        with self._lock:
+            old, self.queue = self.queue, KitchenScheduler(orders)
+        for order in orders:
+            if order['id'] not in old:
+                self.db.events.publish('order_added', order=order)
+        for order in old.ordered():
+            if order['id'] not in self.queue:
+                self.db.events.publish('order_removed', order=order)
+
+    def _on_order_added(self, order):
+        with self._lock:
+            if order['id'] not in self.queue:
+                self.queue.push(order)
+
+    def _on_order_removed(self, order):
+        with self._lock:
+            self.queue.remove(order['id'])
+
+    def _on_order_started(self, order_id, started_at):
+        with self._lock:
+            order = self.queue.get(order_id)
+            if order is not None:
+                order['started_at'] = started_at
+
+    def enqueue(self, order_data):
+        """Submit through the service, retrying lost connections.
+
+        The order gets a client_key first, so a retry of a submit whose
+        reply was lost returns the same order instead of adding another.
+        """
+        order_data.setdefault('client_key', uuid.uuid4().hex)
+        for attempt in range(self.SUBMIT_ATTEMPTS):
+            try:
+                return self.db.client.call('queue', 'enqueue', order_data)
+            except (http.client.HTTPException, OSError):
+                if attempt == self.SUBMIT_ATTEMPTS - 1:
+                    raise
+                time.sleep(self.RETRY_SECONDS * 2 ** attempt)
+
+    def dequeue(self):
+        return self.db.client.call('queue', 'dequeue')
+
+    def start(self, order_id):
+        return self.db.client.call('queue', 'start', order_id)
+
+    def complete(self, order_id):
+        return self.db.client.call('queue', 'complete', order_id)
+
+    def cancel(self, order_id):
+        return self.db.client.call('queue', 'cancel', order_id)
+
+    def peek(self, n=1):
+        with self._lock:
+            return self.queue.peek(n)
+
+    def get_all(self):
+        with self._lock:
+            return self.queue.ordered()
+
+    def size(self):
+        return len(self.queue)
+
+    def etas(self):
+        return self.estimator.etas(self.get_all())
+
+    def forecast(self, hours=3):
+        return self.estimator.forecast(self.size(), hours)
+
+    def refresh(self):
+        self.load_orders()
+
+
 # ==================== KV STRING ====================
+# Only the tab bar is built at startup. Each screen's rules are loaded and the
+# screen created the first time its tab is opened (AdminApp.load_screen).
 kv_string = '''
+<RecycledList@RecycleView>:
+    RecycleBoxLayout:
+        default_size: None, dp(72)
+        default_size_hint: 1, None
+        size_hint_y: None
+        height: self.minimum_height
+        orientation: "vertical"
+
+MDScreen:
+    MDBottomNavigation:
+        id: bottom_nav
+        panel_color: "#333333"
+        on_switch_tabs: app.on_tab_switch(*args)
+
+        MDBottomNavigationItem:
+            id: orders_tab
+            name: "orders_tab"
+            text: "Orders"
+            icon: "cart-outline"
+
+        MDBottomNavigationItem:
+            id: prep_tab
+            name: "prep_tab"
+            text: "Prep"
+            icon: "pot-steam-outline"
+
+        MDBottomNavigationItem:
+            id: history_tab
+            name: "history_tab"
+            text: "History"
+            icon: "history"
+
+        MDBottomNavigationItem:
+            id: menu_tab
+            name: "menu_tab"
+            text: "Menu"
+            icon: "food"
+
+        MDBottomNavigationItem:
+            id: stats_tab
+            name: "stats_tab"
+            text: "Stats"
+            icon: "chart-line"
+'''
+
+SCREEN_KV = {
+    'orders_tab': '''
+<OrderRow>:
+    IconLeftWidget:
+        icon: "pot-steam-outline" if root.started else "clock-outline"
+        on_release: root.start()
+    IconRightWidget:
+        icon: "check-bold"
+        theme_text_color: "Custom"
+        text_color: 0, 0.8, 0, 1
+        on_release: root.complete()
+
 <OrdersScreen>:
     name: "orders"
     BoxLayout:
@@ -204,9 +2748,58 @@ kv_string = '''
             elevation: 10
             right_action_items: [["refresh", lambda x: root.refresh_orders()]]
 
-        ScrollView:
-            MDList:
+        MDLabel:
+            text: root.forecast_text
+            theme_text_color: "Secondary"
+            size_hint_y: None
+            height: "32dp"
+            halign: "center"
+
+        RelativeLayout:
+            RecycledList:
                 id: order_list
+                viewclass: "OrderRow"
+            MDLabel:
+                text: "No pending orders"
+                halign: "center"
+                theme_text_color: "Hint"
+                size_hint_y: None
+                height: "50dp"
+                pos_hint: {"top": 1}
+                opacity: 1 if root.is_empty else 0
+''',
+
+    'prep_tab': '''
+<PrepRow@TwoLineAvatarIconListItem>:
+    IconLeftWidget:
+        icon: "pot-steam-outline"
+
+<PrepScreen>:
+    name: "prep"
+    BoxLayout:
+        orientation: "vertical"
+        MDTopAppBar:
+            title: "To Prep"
+            elevation: 10
+
+        RelativeLayout:
+            RecycledList:
+                id: prep_list
+                viewclass: "PrepRow"
+            MDLabel:
+                text: "Nothing to prep"
+                halign: "center"
+                theme_text_color: "Hint"
+                size_hint_y: None
+                height: "50dp"
+                pos_hint: {"top": 1}
+                opacity: 1 if root.is_empty else 0
+''',
+
+    'history_tab': '''
+<TransactionRow>:
+    IconLeftWidget:
+        icon: "receipt"
 
 <TransactionHistoryScreen>:
     name: "history"
@@ -217,10 +2810,30 @@ kv_string = '''
             elevation: 10
             right_action_items: [["refresh", lambda x: root.refresh_transactions()]]
 
-        ScrollView:
-            MDList:
+        MDTextField:
+            id: search_field
+            hint_text: "Search customer or item  (from:2026-10-01 to:2026-10-07 min:100 max:500)"
+            mode: "rectangle"
+            size_hint_x: 0.95
+            pos_hint: {"center_x": .5}
+            on_text: root.on_search_text(self.text)
+
+        RelativeLayout:
+            RecycledList:
                 id: transaction_list
+                viewclass: "TransactionRow"
+                on_scroll_y: root.on_list_scroll(*args)
+            MDLabel:
+                text: "Loading..." if root.is_loading else ("No matches" if root.search else "No transactions yet")
+                halign: "center"
+                theme_text_color: "Hint"
+                size_hint_y: None
+                height: "50dp"
+                pos_hint: {"top": 1}
+                opacity: 1 if root.is_empty else 0
+''',
 
+    'menu_tab': '''
 <MenuScreen>:
     name: "menu"
     BoxLayout:
@@ -238,7 +2851,9 @@ kv_string = '''
             icon: "plus"
             pos_hint: {"right": 0.9, "bottom": 0.1}
             on_release: root.show_add_dialog()
+''',
 
+    'stats_tab': '''
 <StatsScreen>:
     name: "stats"
     BoxLayout:
@@ -246,6 +2861,7 @@ kv_string = '''
         MDTopAppBar:
             title: "Statistics"
             elevation: 10
+            right_action_items: [["bug-outline", lambda x: app.show_profile_report()]]
 
         ScrollView:
             GridLayout:
@@ -294,132 +2910,308 @@ kv_string = '''
                         theme_text_color: "Custom"
                         text_color: 1, 1, 1, 1
 
+                MDBoxLayout:
+                    size_hint_y: None
+                    height: "40dp"
+                    spacing: "8dp"
+                    MDRectangleFlatButton:
+                        text: "7 days"
+                        on_release: root.range_days = 7
+                    MDRectangleFlatButton:
+                        text: "30 days"
+                        on_release: root.range_days = 30
+                    MDRectangleFlatButton:
+                        text: "90 days"
+                        on_release: root.range_days = 90
+                    MDRectangleFlatButton:
+                        text: "All"
+                        on_release: root.range_days = 0
+
+                MDLabel:
+                    text: root.report_text
+                    size_hint_y: None
+                    height: self.texture_size[1]
+
+                MDLabel:
+                    text: "Orders by hour"
+                    font_style: "Subtitle1"
+                    size_hint_y: None
+                    height: "30dp"
+                BarChart:
+                    id: hourly_chart
+                    size_hint_y: None
+                    height: "160dp"
+
+                MDLabel:
+                    text: f"Revenue by {root.bucket}"
+                    font_style: "Subtitle1"
+                    size_hint_y: None
+                    height: "30dp"
+                BarChart:
+                    id: revenue_chart
+                    size_hint_y: None
+                    height: "160dp"
+                    bar_color: 0.18, 0.49, 0.36, 1
+
+                MDLabel:
+                    text: "Category revenue"
+                    font_style: "Subtitle1"
+                    size_hint_y: None
+                    height: "30dp"
+                BarChart:
+                    id: category_chart
+                    size_hint_y: None
+                    height: "160dp"
+                    bar_color: 0.49, 0.36, 0.18, 1
+
+                MDLabel:
+                    text: "Top items"
+                    font_style: "Subtitle1"
+                    size_hint_y: None
+                    height: "30dp"
+                MDLabel:
+                    text: root.top_items_text
+                    size_hint_y: None
+                    height: self.texture_size[1]
+
                 MDRectangleFlatButton:
                     text: "Refresh Stats"
                     size_hint_y: None
                     height: "50dp"
                     pos_hint: {"center_x": 0.5}
                     on_release: root.refresh_stats()
+''',
+}
 
-MDScreen:
-    MDBottomNavigation:
-        id: bottom_nav
-        panel_color: "#333333"
-        on_switch_tabs: app.on_tab_switch(*args)
 
-        MDBottomNavigationItem:
-            name: "orders_tab"
-            text: "Orders"
-            icon: "cart-outline"
-            OrdersScreen:
-                id: orders_screen
+# ==================== SCREENS ====================
 
-        MDBottomNavigationItem:
-            name: "history_tab"
-            text: "History"
-            icon: "history"
-            TransactionHistoryScreen:
-                id: transaction_history_screen
+class OrderRow(TwoLineAvatarIconListItem):
+    """Recycled row of the order queue; `order` is rebound as the list scrolls"""
+    order = ObjectProperty(None, allownone=True)
+    started = BooleanProperty(False)
 
-        MDBottomNavigationItem:
-            name: "menu_tab"
-            text: "Menu"
-            icon: "food"
-            MenuScreen:
-                id: menu_screen
+    def start(self):
+        if self.order is not None and not self.started:
+            MDApp.get_running_app().screen('orders_tab').start_order(self.order)
 
-        MDBottomNavigationItem:
-            name: "stats_tab"
-            text: "Stats"
-            icon: "chart-line"
-            StatsScreen:
-                id: stats_screen
-'''
+    def complete(self):
+        if self.order is not None:
+            MDApp.get_running_app().screen('orders_tab').complete_order(self.order)
 
 
-# ==================== SCREENS ====================
+class TransactionRow(TwoLineAvatarIconListItem):
+    """Recycled row of the transaction history"""
+
 
 class OrdersScreen(MDScreen):
+    is_empty = BooleanProperty(False)
+    forecast_text = StringProperty("")
+    dirty = True   # needs a full reload before it is shown next
+    ETA_INTERVAL = 30   # seconds; ETAs move with the clock even when nothing happens
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._etas = {}
+        self._eta_trigger = Clock.create_trigger(self.update_etas, 0.5)
+        Clock.schedule_interval(self.update_etas, self.ETA_INTERVAL)
+
     def on_enter(self):
         """Refresh when screen becomes visible"""
-        self.refresh_orders()
+        self.refresh_if_dirty()
 
+    def refresh_if_dirty(self):
+        if self.dirty:
+            self.refresh_orders()
+
+    def subscribe(self, events):
+        # Changes can be published from the DB worker; widgets are only
+        # touched on the main thread.
+        events.subscribe('order_added', mainthread(self.on_order_added))
+        events.subscribe('order_removed', mainthread(self.on_order_removed))
+        events.subscribe('order_started', mainthread(self.on_order_started))
+
+    @profiled
     def refresh_orders(self):
+        # The RecycleView only builds widgets for the rows on screen, so a
+        # refresh just swaps the data list instead of rebuilding every item.
         app = MDApp.get_running_app()
-        self.ids.order_list.clear_widgets()
         orders = app.order_queue.get_all()
-
-        if not orders:
-            self.ids.order_list.add_widget(
-                MDLabel(
-                    text="No pending orders", 
-                    halign="center", 
-                    theme_text_color="Hint",
-                    size_hint_y=None,
-                    height="50dp"
-                )
-            )
+        self._etas = app.order_queue.estimator.etas(orders)
+        self.ids.order_list.data = [self.order_row(order) for order in orders]
+        self.is_empty = not orders
+        self.dirty = False
+        self.update_forecast()
+
+    def on_order_added(self, order):
+        if self.dirty:
+            return  # the next full reload will include it
+        # Keep rows in the scheduler's order
+        data = self.ids.order_list.data
+        if any(row['order']['id'] == order['id'] for row in data):
+            return  # already picked up by a reload
+        key = schedule_key(order)
+        index = next((i for i, row in enumerate(data) if schedule_key(row['order']) > key), len(data))
+        data.insert(index, self.order_row(order))
+        self.is_empty = False
+        self._eta_trigger()
+
+    def on_order_removed(self, order):
+        if self.dirty:
+            return
+        data = self.ids.order_list.data
+        for index, row in enumerate(data):
+            if row['order']['id'] == order['id']:
+                del data[index]
+                break
+        self.is_empty = not data
+        self._eta_trigger()
+
+    def on_order_started(self, order_id, started_at):
+        if self.dirty:
+            return
+        for row in self.ids.order_list.data:
+            if row['order']['id'] == order_id:
+                row['order']['started_at'] = started_at
+        self._eta_trigger()
+
+    def update_etas(self, dt=None):
+        """Recompute every ETA from the estimator's averages - no database reads"""
+        if self.dirty:
             return
+        app = MDApp.get_running_app()
+        data = self.ids.order_list.data
+        self._etas = app.order_queue.estimator.etas([row['order'] for row in data])
+        self.ids.order_list.data = [self.order_row(row['order']) for row in data]
+        self.update_forecast()
+
+    def update_forecast(self):
+        forecast = MDApp.get_running_app().order_queue.forecast()
+        self.forecast_text = "Expected queue: " + " • ".join(
+            f"{time.strftime('%I:%M %p', time.localtime(end))}: {round(depth)}" for end, depth in forecast
+        )
 
-        for order in orders:
-            items_str = ", ".join([f"{i['name']} x{i['qty']}" for i in order['items']])
-            
-            # Format timestamp
-            timestamp = order.get('timestamp', '')
-            formatted_time = self.format_timestamp(timestamp)
+    def order_row(self, order):
+        """RecycleView data for one pending OrderRecord"""
+        items_str = ", ".join([f"{i.name} x{i.qty}" for i in order.items])
 
-            item = TwoLineAvatarIconListItem(
-                text=f"{order['customer_name']} - ₱{order['total_price']:,.2f}",
-                secondary_text=f"Received: {formatted_time} • {items_str}"
-            )
-            item.add_widget(IconLeftWidget(icon="clock-outline"))
-            btn = IconRightWidget(
-                icon="check-bold", 
-                theme_text_color="Custom", 
-                text_color=(0, 0.8, 0, 1)
-            )
-            btn.bind(on_release=lambda x, o=order: self.complete_order(o))
-            item.add_widget(btn)
-            self.ids.order_list.add_widget(item)
-
-    def format_timestamp(self, timestamp):
-        """Format timestamp for display"""
-        if not timestamp:
-            return "Time not available"
-        
-        try:
-            # Handle different timestamp formats
-            for fmt in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S"]:
-                try:
-                    dt = datetime.strptime(timestamp, fmt)
-                    return dt.strftime("%m/%d/%Y %I:%M:%S %p")
-                except:
-                    continue
-            return timestamp
-        except:
-            return timestamp
+        formatted_time = display_time(order)
+
+        priority = order.priority or 'dine-in'
+        tag = "" if priority == 'dine-in' else f" [{priority.upper()}]"
+
+        eta = self._etas.get(order.id)
+        eta_str = f" • Ready ~{time.strftime('%I:%M %p', time.localtime(eta))}" if eta else ""
+
+        return {
+            'text': f"{order.customer_name}{tag} - ₱{order.total_price:,.2f}",
+            'secondary_text': f"Received: {formatted_time}{eta_str} • {items_str}",
+            'order': order,
+            'started': bool(order.started_at),
+        }
+
+    def start_order(self, order):
+        app = MDApp.get_running_app()
+        app.db_worker.submit(app.order_queue.start, order['id'])
 
     def complete_order(self, order):
         app = MDApp.get_running_app()
-        completed_order = app.order_queue.dequeue()
-        if completed_order:
-            self.refresh_orders()
-            # Refresh other screens
-            app.refresh_history()
-            app.refresh_stats()
+        # The queue and database publish the change; every screen that
+        # shows this order (including this one) updates itself from that.
+        app.db_worker.submit(app.order_queue.complete, order['id'])
+
+
+class PrepScreen(MDScreen):
+    """Per-item totals across all pending orders, read from app.prep_board"""
+    is_empty = BooleanProperty(True)
+    REDRAW_DELAY = 0.5   # at rush volume, many orders share one redraw
+    dirty = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._shown_version = None
+        self._redraw_event = None
+
+    def on_enter(self):
+        self.refresh_if_dirty()
+
+    def refresh_if_dirty(self):
+        if self.dirty or MDApp.get_running_app().prep_board.version != self._shown_version:
+            self.refresh_board()
+
+    def subscribe(self, events):
+        events.subscribe('order_added', mainthread(self.on_order_changed))
+        events.subscribe('order_removed', mainthread(self.on_order_changed))
+
+    def on_order_changed(self, order):
+        if not self._redraw_event:
+            self._redraw_event = Clock.schedule_once(self.refresh_board, self.REDRAW_DELAY)
+
+    @profiled
+    def refresh_board(self, dt=None):
+        self._redraw_event = None
+        board = MDApp.get_running_app().prep_board
+        version = board.version
+        rows = board.rows()
+        self.ids.prep_list.data = [
+            {'text': f"{qty} × {name}", 'secondary_text': f"in {tickets} order{'s' if tickets != 1 else ''}"}
+            for name, qty, tickets in rows
+        ]
+        self.is_empty = not rows
+        self._shown_version = version
+        self.dirty = False
 
 
 class MenuScreen(MDScreen):
+    dirty = True
+    _shown_version = None   # MenuCatalog.version currently on screen
+
     def on_enter(self):
         """Refresh when screen becomes visible"""
-        self.refresh_menu()
+        self.refresh_if_dirty()
+
+    def refresh_if_dirty(self):
+        if self.dirty:
+            self.refresh_menu()
 
+    def subscribe(self, events):
+        events.subscribe('menu_changed', mainthread(self.on_menu_changed))
+
+    def on_menu_changed(self, action, item):
+        # The menu is short and sorted by category, so rebuild it lazily
+        # the next time the tab is shown rather than patching rows in place.
+        self.dirty = True
+        app = MDApp.get_running_app()
+        if app.root and app.root.ids.bottom_nav.current == "menu_tab":
+            self.refresh_menu()
+
+    @profiled
     def refresh_menu(self):
+        from kivymd.uix.label import MDLabel
         app = MDApp.get_running_app()
+        self.dirty = False
+        if not self.ids.menu_list.children:
+            self.ids.menu_list.add_widget(
+                MDLabel(
+                    text="Loading...",
+                    halign="center",
+                    theme_text_color="Hint",
+                    size_hint_y=None,
+                    height="50dp"
+                )
+            )
+        app.db_worker.read(app.db.menu_catalog, on_result=self.show_menu)
+
+    @profiled
+    def show_menu(self, catalog):
+        from kivymd.uix.label import MDLabel
+        from kivymd.uix.list import IconLeftWidget, IconRightWidget
+        if catalog.version == self._shown_version and self.ids.menu_list.children:
+            return  # nothing was added or deleted since the last build
+        self._shown_version = catalog.version
         self.ids.menu_list.clear_widgets()
-        menu = app.db.get_menu()
         
-        if not menu:
+        if not catalog:
             self.ids.menu_list.add_widget(
                 MDLabel(
                     text="No menu items. Add some!", 
@@ -431,7 +3223,7 @@ class MenuScreen(MDScreen):
             )
             return
 
-        for m in menu:
+        for m in catalog.items:
             li = TwoLineAvatarIconListItem(
                 text=m['name'],
                 secondary_text=f"₱{m['price']:,.2f} • {m['category']}"
@@ -448,12 +3240,16 @@ class MenuScreen(MDScreen):
 
     def delete_item(self, item_id):
         app = MDApp.get_running_app()
-        app.db.delete_menu_item(item_id)
-        self.refresh_menu()
+        app.db_worker.submit(app.db.delete_menu_item, item_id)
 
     def show_add_dialog(self):
         app = MDApp.get_running_app()
         if not hasattr(app, 'menu_dialog') or not app.menu_dialog:
+            from kivymd.uix.boxlayout import MDBoxLayout
+            from kivymd.uix.button import MDFillRoundFlatButton, MDRectangleFlatButton
+            from kivymd.uix.dialog import MDDialog
+            from kivymd.uix.textfield import MDTextField
+
             self.name_input = MDTextField(
                 hint_text="Item Name",
                 size_hint_y=None,
@@ -521,108 +3317,380 @@ class MenuScreen(MDScreen):
             if price <= 0:
                 return
                 
-            app.db.add_menu_item(name, price, cat)
-            self.refresh_menu()
+            app.db_worker.submit(app.db.add_menu_item, name, price, cat)
             app.menu_dialog.dismiss()
         except ValueError:
             # Invalid price
             pass
 
 
+class BarChart(Widget):
+    """Bars drawn straight on the canvas, with some of the `labels` under them"""
+    values = ListProperty([])
+    labels = ListProperty([])
+    bar_color = ListProperty([1, 0.6, 0, 1])
+    MAX_LABELS = 12
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.bind(values=self.redraw, labels=self.redraw, pos=self.redraw, size=self.redraw)
+
+    def redraw(self, *args):
+        from kivy.core.text import Label as CoreLabel
+        from kivy.graphics import Color, Rectangle
+        from kivy.metrics import dp
+
+        self.canvas.clear()
+        if not self.values:
+            return
+        label_height = dp(16)
+        tallest = max(self.values) or 1
+        width = self.width / len(self.values)
+        step = -(-len(self.labels) // self.MAX_LABELS) or 1
+        with self.canvas:
+            Color(*self.bar_color)
+            for i, value in enumerate(self.values):
+                height = (self.height - label_height) * value / tallest
+                Rectangle(pos=(self.x + (i + 0.1) * width, self.y + label_height), size=(width * 0.8, height))
+            Color(1, 1, 1, 0.7)
+            for i in range(0, len(self.labels), step):
+                label = CoreLabel(text=str(self.labels[i]), font_size=dp(10))
+                label.refresh()
+                texture = label.texture
+                Rectangle(texture=texture, size=texture.size,
+                          pos=(self.x + (i + 0.5) * width - texture.width / 2, self.y))
+
+
 class StatsScreen(MDScreen):
     total_orders = StringProperty("0")
     daily_revenue = StringProperty("0.00")
     average_order = StringProperty("0.00")
+    range_days = NumericProperty(30)   # days the charts cover, 0 for all time
+    bucket = StringProperty("day")
+    report_text = StringProperty("")
+    top_items_text = StringProperty("")
+    REPORT_DELAY = 2   # seconds to gather completions before the charts reload
+    dirty = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._day = None
+        self._orders = 0
+        self._revenue = 0.0
+        self._report_event = None
 
     def on_enter(self):
         """Refresh when screen becomes visible"""
-        self.refresh_stats()
+        self.refresh_if_dirty()
 
+    def refresh_if_dirty(self):
+        # Today's numbers also go stale when the date rolls over
+        if self.dirty or self._day != date.today().isoformat():
+            self.refresh_stats()
+
+    def subscribe(self, events):
+        events.subscribe('order_status_changed', mainthread(self.on_order_status_changed))
+
+    @profiled
     def refresh_stats(self):
         app = MDApp.get_running_app()
-        stats = app.db.get_today_stats()
-        self.total_orders = str(stats['orders'])
-        self.daily_revenue = f"{stats['revenue']:,.2f}"
-        self.average_order = f"{stats['avg']:,.2f}"
+        app.db_worker.read(app.db.get_today_stats, on_result=self.show_stats)
+        self.refresh_report()
+
+    def on_range_days(self, instance, value):
+        self.refresh_report()
+
+    def refresh_report(self, dt=None):
+        self._report_event = None
+        start = None
+        if self.range_days:
+            start = (date.today() - timedelta(days=self.range_days - 1)).isoformat()
+        app = MDApp.get_running_app()
+        app.db_worker.read(app.db.sales_report, start=start,
+                           on_result=self.show_report, on_error=self.report_failed)
+
+    @profiled
+    def show_report(self, report):
+        self.bucket = report['bucket']
+        wow = report['week_over_week']
+        change = f" ({wow['change']:+.1f}%)" if wow['change'] is not None else ""
+        self.report_text = (
+            f"{report['start']} to {report['end']}: {report['orders']} orders, ₱{report['revenue']:,.2f}\n"
+            f"Last 7 days ₱{wow['this_week']['revenue']:,.2f} vs ₱{wow['last_week']['revenue']:,.2f}"
+            f" the week before{change}"
+        )
+        self.ids.hourly_chart.labels = [f"{h}" for h in range(24)]
+        self.ids.hourly_chart.values = report['hourly']['orders']
+        self.ids.revenue_chart.labels = [
+            label[:7] if self.bucket == 'month' else label[5:] for label in report['series']['labels']
+        ]
+        self.ids.revenue_chart.values = report['series']['revenue']
+        self.ids.category_chart.labels = [c['category'] for c in report['categories']]
+        self.ids.category_chart.values = [c['revenue'] for c in report['categories']]
+        self.top_items_text = "\n".join(
+            f"{i['name']}: {i['qty']} sold, ₱{i['revenue']:,.2f}" for i in report['top_items']
+        ) or "No sales in this range"
+
+    def report_failed(self, error):
+        if isinstance(error, ImportError):
+            self.report_text = "Charts need numpy: pip install numpy"
+        else:
+            log.error("Sales report failed", exc_info=error)
+            self.report_text = f"Could not load charts: {error}"
+
+    @profiled
+    def show_stats(self, stats):
+        self._day = date.today().isoformat()
+        self._orders = stats['orders']
+        self._revenue = stats['revenue']
+        self._show()
+        self.dirty = False
+
+    def on_order_status_changed(self, order, status, previous_status):
+        if status != 'completed' or previous_status == 'completed':
+            return
+        if self.dirty or order['timestamp'][:10] != self._day:
+            self.dirty = True
+            return
+        self._orders += 1
+        self._revenue += order['total_price'] or 0
+        self._show()
+        if not self._report_event:
+            self._report_event = Clock.schedule_once(self.refresh_report, self.REPORT_DELAY)
+
+    def _show(self):
+        avg = self._revenue / self._orders if self._orders else 0.0
+        self.total_orders = str(self._orders)
+        self.daily_revenue = f"{self._revenue:,.2f}"
+        self.average_order = f"{avg:,.2f}"
 
 
 class TransactionHistoryScreen(MDScreen):
+    PAGE_SIZE = 50
+    SEARCH_DELAY = 0.3   # seconds of no typing before a search runs
+    SEARCH_FILTERS = {'from': 'start', 'to': 'end', 'min': 'min_total', 'max': 'max_total'}
+    is_empty = BooleanProperty(False)
+    is_loading = BooleanProperty(False)
+    search = DictProperty({})   # search_transactions keyword arguments, {} shows everything
+    dirty = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._last_loaded = None   # keyset cursor: last transaction on screen
+        self._exhausted = False
+        self._shown_ids = set()
+        self._generation = 0       # bumped on reload so stale pages are dropped
+        self._search_event = None
+
     def on_enter(self):
         """Refresh when screen becomes visible"""
-        self.refresh_transactions()
-        
-    def refresh_transactions(self):
-        app = MDApp.get_running_app()
-        self.ids.transaction_list.clear_widgets()
+        self.refresh_if_dirty()
 
-        transactions = app.db.get_transactions()
+    def refresh_if_dirty(self):
+        if self.dirty:
+            self.refresh_transactions()
 
-        if not transactions:
-            self.ids.transaction_list.add_widget(
-                MDLabel(
-                    text="No transactions yet",
-                    halign="center",
-                    theme_text_color="Hint",
-                    size_hint_y=None,
-                    height="50dp"
-                )
-            )
+    def subscribe(self, events):
+        events.subscribe('order_status_changed', mainthread(self.on_order_status_changed))
+
+    @profiled
+    def refresh_transactions(self):
+        """Reload history from the newest transaction"""
+        self._generation += 1
+        self._last_loaded = None
+        self._exhausted = False
+        self._shown_ids = set()
+        self.is_loading = False
+        self.ids.transaction_list.data = []
+        self.is_empty = True
+        self.dirty = False
+        self.load_more_transactions()
+
+    def on_order_status_changed(self, order, status, previous_status):
+        if status != 'completed' or previous_status == 'completed' or self.dirty:
             return
+        if self.search:
+            return  # search results stay put; clearing the search reloads
+        if order['id'] in self._shown_ids:
+            return
+        # Newest first, so a freshly completed order goes on top
+        self._shown_ids.add(order['id'])
+        self.ids.transaction_list.data.insert(0, self.transaction_row(order))
+        self.is_empty = False
+
+    def load_more_transactions(self):
+        """Fetch the next page of older transactions in the background"""
+        if self._exhausted or self.is_loading:
+            return
+        app = MDApp.get_running_app()
+        self.is_loading = True
+        generation = self._generation
+        fetch = app.db.search_transactions if self.search else app.db.get_transactions
+        app.db_worker.read(
+            fetch, after=self._last_loaded, limit=self.PAGE_SIZE, include_archive=True, **self.search,
+            on_result=lambda page: self.add_page(page, generation),
+            on_error=lambda error: setattr(self, 'is_loading', False)
+        )
 
-        for t in transactions:
-            items_str = ", ".join([f"{i['name']} x{i['qty']}" for i in t['items']])
-            
-            # Format timestamp
-            timestamp = t.get('timestamp', '')
-            formatted_time = self.format_timestamp(timestamp)
+    def on_search_text(self, text):
+        """Search once the user pauses typing"""
+        if self._search_event:
+            self._search_event.cancel()
+        self._search_event = Clock.schedule_once(lambda dt: self.run_search(text), self.SEARCH_DELAY)
+
+    def run_search(self, text):
+        search = self.parse_search(text)
+        if search != self.search:
+            self.search = search
+            self.refresh_transactions()
+
+    def parse_search(self, text):
+        """Split the search box into search_transactions arguments.
+
+        Plain words are matched against names; from:/to: take dates and
+        min:/max: take amounts. Filters that do not parse are ignored.
+        """
+        search, words = {}, []
+        for word in text.split():
+            key, _, value = word.partition(':')
+            if key.lower() in self.SEARCH_FILTERS and value:
+                arg = self.SEARCH_FILTERS[key.lower()]
+                if arg in ('start', 'end'):
+                    if timestamp_to_epoch(value + " 00:00:00") is not None:
+                        search[arg] = value
+                else:
+                    try:
+                        search[arg] = float(value)
+                    except ValueError:
+                        pass
+            else:
+                words.append(word)
+        if words:
+            search['text'] = " ".join(words)
+        return search
+
+    @profiled
+    def add_page(self, page, generation):
+        """Append a fetched page to the list"""
+        if generation != self._generation:
+            return  # the list was reloaded while this page was in flight
+        self.is_loading = False
+        if len(page) < self.PAGE_SIZE:
+            self._exhausted = True
+        if not page:
+            return
+        self._last_loaded = page[-1]
+
+        rv = self.ids.transaction_list
+        hidden = rv.layout_manager.height - rv.height
+        from_top = (1 - rv.scroll_y) * hidden if hidden > 0 else 0
+        new = [t for t in page if t['id'] not in self._shown_ids]
+        self._shown_ids.update(t['id'] for t in new)
+        rv.data.extend([self.transaction_row(t) for t in new])
+        self.is_empty = not rv.data
+        # scroll_y is relative to the content height, so put the user back at
+        # the same pixel offset once the longer list has been laid out.
+        if from_top:
+            Clock.schedule_once(lambda dt: self._restore_scroll(from_top))
+
+    def _restore_scroll(self, from_top):
+        rv = self.ids.transaction_list
+        hidden = rv.layout_manager.height - rv.height
+        if hidden > 0:
+            rv.scroll_y = max(0, 1 - from_top / hidden)
+
+    def on_list_scroll(self, rv, scroll_y):
+        """Fetch the next page once the user is within a screenful of the end"""
+        hidden = rv.layout_manager.height - rv.height
+        if hidden > 0 and scroll_y * hidden < rv.height:
+            self.load_more_transactions()
+
+    def transaction_row(self, t):
+        """RecycleView data for one completed OrderRecord"""
+        items_str = ", ".join([f"{i.name} x{i.qty}" for i in t.items])
+
+        formatted_time = display_time(t)
+
+        return {
+            'text': f"{t.customer_name} – ₱{t.total_price:,.2f}",
+            'secondary_text': f"Completed: {formatted_time} • {items_str}",
+        }
 
-            item = TwoLineAvatarIconListItem(
-                text=f"{t['customer_name']} – ₱{t['total_price']:,.2f}",
-                secondary_text=f"Completed: {formatted_time} • {items_str}"
-            )
-            item.add_widget(IconLeftWidget(icon="receipt"))
-            self.ids.transaction_list.add_widget(item)
 
-    def format_timestamp(self, timestamp):
-        """Format timestamp for display"""
-        if not timestamp:
-            return "Time not available"
-        
-        try: 
-            for fmt in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S"]:
-                try:
-                    dt = datetime.strptime(timestamp, fmt)
-                    return dt.strftime("%m/%d/%Y %I:%M:%S %p")
-                except:
-                    continue
-            return timestamp
-        except:
-            return timestamp
+# ==================== MAIN APP ====================
+SCREENS = {
+    'orders_tab': OrdersScreen,
+    'prep_tab': PrepScreen,
+    'history_tab': TransactionHistoryScreen,
+    'menu_tab': MenuScreen,
+    'stats_tab': StatsScreen,
+}
 
 
-# ==================== MAIN APP ====================
 class AdminApp(MDApp):
-    def __init__(self, **kwargs):
+    def __init__(self, db_options=None, server=None, startup_report=False, profile_file=None, **kwargs):
         super().__init__(**kwargs)
-        self.db = Database()
-        self.order_queue = OrderQueue(self.db)
+        self.startup_times = [('imports', IMPORTED - STARTED)]
+        self.show_startup_report = startup_report
+        self.profile_file = profile_file
+        opened = time.perf_counter()
+        if server:
+            # Another terminal's order service owns the database
+            self.db = RemoteDatabase(server)
+            self.order_queue = RemoteOrderQueue(self.db)
+        else:
+            self.db = Database(**(db_options or {}))
+            self.order_queue = OrderQueue(self.db)
+        self.startup_times.append(('open database', time.perf_counter() - opened))
+        self.prep_board = PrepBoard(self.order_queue, self.db.events)
+        self.db_worker = DatabaseWorker()
         self.menu_dialog = None
+        self.screens = {}   # tab name -> screen, filled in as tabs are first opened
 
     def build(self):
         self.theme_cls.theme_style = "Dark"
         self.theme_cls.primary_palette = "Orange"
         self.theme_cls.accent_palette = "Amber"
-        return Builder.load_string(kv_string)
+        built = time.perf_counter()
+        root = Builder.load_string(kv_string)
+        self.startup_times.append(('KV build', time.perf_counter() - built))
+        self.db.events.subscribe('service_connected', mainthread(self.on_service_connected))
+        return root
+
+    def screen(self, tab):
+        """The screen of a tab, or None if the tab has not been opened yet"""
+        return self.screens.get(tab)
+
+    def load_screen(self, tab):
+        """Build a tab's screen the first time it is needed"""
+        if tab not in self.screens:
+            built = time.perf_counter()
+            Builder.load_string(SCREEN_KV[tab])
+            screen = SCREENS[tab]()
+            screen.subscribe(self.db.events)
+            self.root.ids[tab].add_widget(screen)
+            self.screens[tab] = screen
+            self.startup_times.append((f'{tab} screen', time.perf_counter() - built))
+        return self.screens[tab]
+
+    def on_service_connected(self):
+        """Events may have been missed while disconnected; reload what is on screen"""
+        if not self.root:
+            return
+        for tab, screen in self.screens.items():
+            if tab != 'orders_tab':
+                screen.dirty = True
+        self.refresh_current_tab()
     
     def refresh_history(self):
         """Refresh the Transaction History tab."""
-        history_screen = self.root.ids.transaction_history_screen
+        history_screen = self.screen('history_tab')
         if history_screen:
             history_screen.refresh_transactions()
     
     def refresh_stats(self):
         """Refresh the Stats tab."""
-        stats_screen = self.root.ids.stats_screen
+        stats_screen = self.screen('stats_tab')
         if stats_screen:
             stats_screen.refresh_stats()
 
@@ -632,96 +3700,212 @@ class AdminApp(MDApp):
         Clock.schedule_once(self.refresh_current_tab, 0.1)
 
     def refresh_current_tab(self, dt=None):
-        """Refresh the currently active tab"""
-        bottom_nav = self.root.ids.bottom_nav
-        current_tab = bottom_nav.current
-        
-        if current_tab == "orders_tab":
-            orders_screen = self.root.ids.orders_screen
-            if orders_screen:
-                orders_screen.refresh_orders()
-                
-        elif current_tab == "menu_tab":
-            menu_screen = self.root.ids.menu_screen
-            if menu_screen:
-                menu_screen.refresh_menu()
-                
-        elif current_tab == "stats_tab":
-            stats_screen = self.root.ids.stats_screen
-            if stats_screen:
-                stats_screen.refresh_stats()
-                
-        elif current_tab == "history_tab":
-            history_screen = self.root.ids.transaction_history_screen
-            if history_screen:
-                history_screen.refresh_transactions()
+        """Bring the active tab up to date, building its screen on the first visit.
 
-    def on_start(self):
-        # Initialize sample data
-        self.initialize_sample_data()
-        
-        # Initial refresh of all screens
-        Clock.schedule_once(self.refresh_all_screens, 0.2)
-
-    def initialize_sample_data(self):
-        """Add sample data if database is empty"""
-        # Sample menu
-        if not self.db.get_menu():
-            samples = [
-                ("Beef Caldereta", 180.0, "Main"),
-                ("Chicken Adobo", 150.0, "Main"),
-                ("Iced Tea", 45.0, "Drinks"),
-                ("Rice", 25.0, "Sides"),
-            ]
-            for n, p, c in samples:
-                self.db.add_menu_item(n, p, c)
-
-        # Sample pending order if queue is empty
-        if self.order_queue.size() == 0:
-            self.items = [ {
-                'customer_name': 'Maria Santos',
-                'items': [
-                    {'name': 'Chicken Adobo', 'qty': 1}, 
-                    {'name': 'Rice', 'qty': 2}, 
-                    {'name': 'Iced Tea', 'qty': 1}
-                ],
-                'total_price': 245.0
-            },
-             {
-                'customer_name': 'Rhovic Gabijan',
-                'items': [
-                    {'name': 'Nilagang Tinola', 'qty': 3}, 
-                    {'name': 'Siomai rice', 'qty': 2}, 
-                    {'name': 'Iced Tea', 'qty': 4}
-                ],
-                'total_price': 500
-            },
-             {
-                'customer_name': 'Eulin Ryan Bertrand',
-                'items': [
-                    {'name': 'Sinigang na Spaghetti', 'qty': 1}, 
-                    {'name': 'Rice', 'qty': 2}, 
-                    {'name': 'Iced Tea', 'qty': 1}
-                ],
-                'total_price': 245.0
-            } ]
-            for items in self.items:
-                self.order_queue.enqueue(items)
-
-        # Add one completed transaction if none exist
-        transactions = self.db.get_transactions()
-        if not transactions:
-            completed_id = self.db.create_order(
-                customer_name="Juan Dela Cruz",
-                items=[{'name': 'Beef Caldereta', 'qty': 1}, {'name': 'Rice', 'qty': 2}],
-                total_price=230.0
-            )
-            self.db.update_order_status(completed_id, 'completed')
+        Screens keep themselves current from change events, so this only
+        reloads a screen that was marked dirty while it was hidden.
+        """
+        current_tab = self.root.ids.bottom_nav.current or 'orders_tab'
+        self.load_screen(current_tab).refresh_if_dirty()
 
-    def refresh_all_screens(self, dt=None):
-        """Refresh all screens initially"""
+    def on_start(self):
         self.refresh_current_tab()
+        from kivy.core.window import Window
+        Window.bind(on_flip=self.on_first_frame)
+
+    def on_first_frame(self, window):
+        from kivy.core.window import Window
+        Window.unbind(on_flip=self.on_first_frame)
+        self.startup_times.append(('first frame (since start)', time.perf_counter() - STARTED))
+        if self.show_startup_report:
+            print(self.startup_report())
+
+    def startup_report(self):
+        lines = ["Startup timings:"]
+        lines += [f"  {name:28} {seconds * 1000:8.1f} ms" for name, seconds in self.startup_times]
+        return "\n".join(lines)
+
+    def show_profile_report(self):
+        """Debug panel with the profiler's timings (bug icon on the Stats tab)"""
+        from kivy.uix.scrollview import ScrollView
+        from kivymd.uix.button import MDFlatButton
+        from kivymd.uix.dialog import MDDialog
+        from kivymd.uix.label import MDLabel
+
+        label = MDLabel(text=PROFILER.report(), font_name="RobotoMono-Regular", font_size="11sp",
+                        size_hint=(None, None))
+        label.bind(texture_size=label.setter('size'))
+        scroll = ScrollView(size_hint_y=None, height="400dp", do_scroll_x=True)
+        scroll.add_widget(label)
+        dialog = MDDialog(
+            title="Profile",
+            type="custom",
+            content_cls=scroll,
+            buttons=[MDFlatButton(text="CLOSE", on_release=lambda x: dialog.dismiss())],
+        )
+        dialog.open()
+
+    def on_stop(self):
+        # Let queued DB calls finish, then write out anything the
+        # write-behind queue is still holding
+        self.db_worker.shutdown()
+        self.db.close()
+        if self.profile_file:
+            PROFILER.dump(self.profile_file)
+            print(PROFILER.report())
+
+
+def seed_sample_data(db, order_queue):
+    """Add sample data if database is empty (python main.py --seed)"""
+    # Sample menu; items missing from an older menu are added too, since
+    # the sample orders below use all of them
+    samples = [
+        ("Beef Caldereta", 180.0, "Main"),
+        ("Chicken Adobo", 150.0, "Main"),
+        ("Chicken Tinola", 160.0, "Main"),
+        ("Sinigang na Baboy", 190.0, "Main"),
+        ("Siomai Rice", 95.0, "Main"),
+        ("Iced Tea", 45.0, "Drinks"),
+        ("Rice", 25.0, "Sides"),
+        ("Extra Egg", 15.0, "Add-ons"),
+    ]
+    menu = db.menu_catalog()
+    for n, p, c in samples:
+        if n not in menu:
+            db.add_menu_item(n, p, c)
+
+    # Sample pending order if queue is empty
+    if order_queue.size() == 0:
+        # Totals are priced from the menu when the orders are enqueued
+        sample_orders = [ {
+            'customer_name': 'Maria Santos',
+            'items': [
+                {'name': 'Chicken Adobo', 'qty': 1}, 
+                {'name': 'Rice', 'qty': 2}, 
+                {'name': 'Iced Tea', 'qty': 1}
+            ]
+        },
+         {
+            'customer_name': 'Rhovic Gabijan',
+            'items': [
+                {'name': 'Chicken Tinola', 'qty': 3}, 
+                {'name': 'Siomai Rice', 'qty': 2, 'modifiers': ['Extra Egg']}, 
+                {'name': 'Iced Tea', 'qty': 4}
+            ]
+        },
+         {
+            'customer_name': 'Eulin Ryan Bertrand',
+            'items': [
+                {'name': 'Sinigang na Baboy', 'qty': 1}, 
+                {'name': 'Rice', 'qty': 2}, 
+                {'name': 'Iced Tea', 'qty': 1}
+            ],
+            'discount_code': 'senior'
+        } ]
+        for items in sample_orders:
+            order_queue.enqueue(items)
+
+    # Add one completed transaction if none exist
+    transactions = db.get_transactions(limit=1)
+    if not transactions:
+        quote = db.pricing().price_order([{'name': 'Beef Caldereta', 'qty': 1}, {'name': 'Rice', 'qty': 2}])
+        completed_id = db.create_order(
+            customer_name="Juan Dela Cruz",
+            items=quote['items'],
+            total_price=quote['total_price'],
+            discount=quote['discount'],
+            tax=quote['tax']
+        )
+        db.update_order_status(completed_id, 'completed')
 
 
 if __name__ == "__main__":
-    AdminApp().run()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Restaurant admin dashboard")
+    parser.add_argument(
+        "--backfill-stats", action="store_true",
+        help="rebuild the daily stats rollup from the orders table and exit"
+    )
+    parser.add_argument(
+        "--write-behind", action="store_true",
+        help="queue database writes and commit them in batches"
+    )
+    parser.add_argument("--flush-ms", type=int, default=200, help="write-behind flush interval")
+    parser.add_argument("--flush-ops", type=int, default=100, help="flush once this many writes are queued")
+    parser.add_argument(
+        "--journal-mode", choices=JOURNAL_MODES, type=str.upper, default="WAL",
+        help="SQLite journal_mode (default %(default)s, which lets history and reports read while orders are written)"
+    )
+    parser.add_argument("--synchronous", choices=SYNCHRONOUS_LEVELS, type=str.upper, help="SQLite synchronous level")
+    parser.add_argument(
+        "--archive", type=int, metavar="DAYS", nargs="?", const=Database.ARCHIVE_AFTER_DAYS,
+        help="move completed orders older than DAYS (default %(const)s) into the monthly archive and exit"
+    )
+    parser.add_argument(
+        "--server", metavar="URL",
+        help="use the order service at URL (see order_server.py) instead of a local database"
+    )
+    parser.add_argument("--seed", action="store_true", help="add the sample menu and orders if missing, then exit")
+    parser.add_argument(
+        "--startup-report", action="store_true",
+        help="print import, database, KV build and first-frame times once the window is up"
+    )
+    parser.add_argument(
+        "--audit-prices", metavar="PERIOD",
+        help="re-check the totals of a day (YYYY-MM-DD) or month (YYYY-MM) of orders and exit"
+    )
+    parser.add_argument(
+        "--reprice", action="store_true",
+        help="with --audit-prices, price lines at today's menu prices instead of the recorded ones"
+    )
+    parser.add_argument(
+        "--profile", metavar="FILE", nargs="?", const="profile.json",
+        help="time SQL statements, DB calls and screen refreshes; write them to FILE (default %(const)s) on exit"
+    )
+    args = parser.parse_args()
+    PROFILER.enabled = args.profile is not None
+    db_options = {
+        'write_behind': args.write_behind,
+        'flush_interval_ms': args.flush_ms,
+        'flush_ops': args.flush_ops,
+        'journal_mode': args.journal_mode,
+        'synchronous': args.synchronous,
+    }
+
+    if args.backfill_stats:
+        db = Database(**db_options)
+        db.rebuild_daily_stats()
+        db.close()
+        print("Daily stats rebuilt.")
+    elif args.seed:
+        if args.server:
+            db = RemoteDatabase(args.server)
+            seed_sample_data(db, RemoteOrderQueue(db))
+        else:
+            db = Database(**db_options)
+            seed_sample_data(db, OrderQueue(db))
+        db.close()
+        print("Sample data added.")
+    elif args.audit_prices:
+        db = Database(**db_options)
+        try:
+            audit = db.audit_prices(args.audit_prices, reprice=args.reprice)
+        except (ValueError, RuntimeError) as error:
+            parser.error(str(error))
+        finally:
+            db.close()
+        print(f"{audit['orders']} orders, {audit['lines']} lines: {audit['mismatched']} mismatched "
+              f"(totals off by {audit['difference']:+,.2f} overall)")
+        for m in audit['mismatches']:
+            unpriced = f", {m['unpriced_lines']} unpriced lines" if m['unpriced_lines'] else ""
+            print(f"  order {m['id']}: recorded {m['total_price']:,.2f}, expected {m['expected']:,.2f}{unpriced}")
+    elif args.archive is not None:
+        db = Database(**db_options)
+        moved = db.archive_orders(args.archive)
+        db.conn.execute("VACUUM")   # give the freed pages back so restaurant.db shrinks
+        db.close()
+        print(f"Archived {moved} orders to {db.archive_dir}.")
+    else:
+        AdminApp(db_options=db_options, server=args.server, startup_report=args.startup_report,
+                 profile_file=args.profile).run()
\ No newline at end of file
@@ -0,0 +1,196 @@
+# order_server.py
+"""Local order service shared by every terminal in the restaurant.
+
+One process owns restaurant.db and the pending-order queue; the counter,
+kitchen and admin dashboards talk to it over HTTP instead of opening the
+database themselves, so SQLite only ever sees one writer.
+
+    python order_server.py --port 8765
+    python main.py --server http://127.0.0.1:8765
+
+Calls are ``POST /db/<method>`` or ``POST /queue/<method>`` with a JSON body
+``{"args": [...], "kwargs": {...}}``; the reply is ``{"result": ...}`` or
+``{"error": "..."}``. ``GET /events`` is a Server-Sent Events stream of the
+same events the app's EventBus carries (order_added, order_removed,
+order_status_changed, order_started, menu_changed).
+"""
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from main import Database, MenuCatalog, OrderQueue, to_plain
+
+log = logging.getLogger("order_server")
+
+DB_CALLS = {
+    'menu_catalog', 'get_menu', 'add_menu_item', 'delete_menu_item',
+    'create_order', 'update_order_status', 'get_pending_orders',
+    'get_transactions', 'search_transactions',
+    'get_today_stats', 'get_item_stats', 'get_category_stats', 'get_best_sellers', 'get_item_revenue',
+    'sales_report', 'prep_estimates',
+}
+# Served from the database's read-only snapshot pool, beside the writes
+READ_CALLS = {
+    'menu_catalog', 'get_menu', 'get_pending_orders', 'get_transactions', 'search_transactions',
+    'get_today_stats', 'get_item_stats', 'get_category_stats', 'get_best_sellers', 'get_item_revenue',
+    'sales_report', 'prep_estimates',
+}
+QUEUE_CALLS = {'enqueue', 'dequeue', 'start', 'complete', 'cancel', 'peek', 'get_all', 'size'}
+PUSHED_EVENTS = ('order_added', 'order_removed', 'order_status_changed', 'order_started', 'menu_changed')
+READ_THREADS = 4
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+KEEPALIVE_SECONDS = 15
+SUBSCRIBER_BACKLOG = 1000   # events a slow terminal may fall behind before it is dropped
+
+
+def to_json(value):
+    """Results that JSON cannot carry as they are"""
+    if isinstance(value, MenuCatalog):
+        return {'items': value.items, 'version': value.version}
+    return value
+
+
+class OrderServer:
+    def __init__(self, database):
+        self.db = database
+        self.queue = OrderQueue(database)
+        # Writes and queue calls run on this one thread, so they reach SQLite
+        # one at a time, in order. Reads run on their own threads against
+        # WAL snapshots, so a slow report never holds up an order.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="order-server-db")
+        self.readers = ThreadPoolExecutor(max_workers=READ_THREADS, thread_name_prefix="order-server-read")
+        self.subscribers = set()   # one asyncio.Queue per /events stream
+        self.loop = None
+        for event in PUSHED_EVENTS:
+            database.events.subscribe(event, lambda event=event, **payload: self._publish(event, payload))
+
+    def _publish(self, event, payload):
+        # Called on the DB thread; hand over to the event loop
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.broadcast, event, json.dumps(payload, default=to_plain))
+
+    def broadcast(self, event, data):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                # End that stream; the client reconnects and resyncs
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+                self.subscribers.discard(queue)
+
+    async def serve(self, host, port):
+        self.loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self.handle, host, port)
+        log.info("Order service listening on http://%s:%s", host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        """One client connection; requests are served until it closes (keep-alive)"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length') or 0))
+
+                if method == 'GET' and path == '/events':
+                    await self.stream_events(writer)
+                    break
+                status, reply = await self.dispatch(method, path, body)
+                data = json.dumps(reply, default=to_plain).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body):
+        _, target, name = (path.split('/') + ['', ''])[:3]
+        if method == 'GET' and target == 'health':
+            return 200, {'result': 'ok'}
+        calls = {'db': (self.db, DB_CALLS), 'queue': (self.queue, QUEUE_CALLS)}.get(target)
+        if method != 'POST' or calls is None or name not in calls[1]:
+            return 404, {'error': f"No such call: {method} {path}"}
+        try:
+            request = json.loads(body or b'{}')
+            fn = getattr(calls[0], name)
+            executor = self.readers if target == 'db' and name in READ_CALLS else self.executor
+            result = await self.loop.run_in_executor(
+                executor, lambda: fn(*request.get('args', ()), **request.get('kwargs', {}))
+            )
+        except (ValueError, TypeError, KeyError) as error:
+            return 400, {'error': str(error)}
+        except Exception as error:
+            log.exception("%s failed", path)
+            return 500, {'error': str(error)}
+        return 200, {'result': to_json(result)}
+
+    async def stream_events(self, writer):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_BACKLOG)
+        self.subscribers.add(queue)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n\r\n")
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                else:
+                    if message is None:
+                        break
+                    writer.write(f"event: {message[0]}\ndata: {message[1]}\n\n".encode())
+                await writer.drain()
+        finally:
+            self.subscribers.discard(queue)
+
+    def close(self):
+        self.readers.shutdown(wait=True)
+        self.executor.shutdown(wait=True)
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local order service for the restaurant terminals")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for the LAN)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", default="restaurant.db", help="database file")
+    parser.add_argument("--write-behind", action="store_true",
+                        help="commit writes in batches; a crash can lose orders already acknowledged")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    # Every write is committed before its reply goes out, so a ticket the
+    # client was told is queued survives a crash; WAL lets the read threads
+    # work on snapshots while it writes
+    database = Database(args.db, write_behind=args.write_behind,
+                        journal_mode="WAL", synchronous="NORMAL", read_pool_size=READ_THREADS)
+    server = OrderServer(database)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# test_database.py
+"""Database checks: python -m unittest test_database"""
+import os
+import tempfile
+import unittest
+
+from main import Database
+
+
+class WriteBehindImportTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.dir.name, "test.db"), write_behind=True,
+                           flush_interval_ms=60000, journal_mode="WAL")
+
+    def tearDown(self):
+        self.db.close()
+        self.dir.cleanup()
+
+    def test_add_after_import_gets_a_new_id(self):
+        failed = []
+        self.db.events.subscribe('write_failed', lambda **payload: failed.append(payload))
+        self.db.add_menu_item("Adobo", 90.0)
+        self.db.flush()
+        self.db.import_menu_items([{'name': "Sisig", 'price': 120.0}])
+        self.db.add_menu_item("Halo-Halo", 75.0)
+        self.db.flush()
+
+        self.db._catalog = None   # read the table, not the cache
+        menu = self.db.get_menu()
+        self.assertCountEqual([m['name'] for m in menu], ["Adobo", "Sisig", "Halo-Halo"])
+        self.assertEqual(len({m['id'] for m in menu}), 3)
+        self.assertEqual(failed, [])
+        self.assertEqual(self.db._pending, [])
+
+
+class OrderRecordTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.dir.name, "test.db"))
+        self.db.add_menu_item("Sinigang na Baboy", 190.0)
+        self.db.add_menu_item("Rice", 25.0, "Sides")
+
+    def tearDown(self):
+        self.db.close()
+        self.dir.cleanup()
+
+    def test_priced_completed_order_round_trips(self):
+        quote = self.db.pricing().price_order(
+            [{'name': "Sinigang na Baboy", 'qty': 1}, {'name': "Rice", 'qty': 2}], discount_code='senior'
+        )
+        order_id = self.db.create_order("Lola Ising", quote['items'], quote['total_price'],
+                                        discount_code='senior', discount=quote['discount'], tax=quote['tax'])
+        self.db.update_order_status(order_id, 'completed')
+
+        order, = self.db.get_transactions(limit=1)
+        self.assertEqual(order.id, order_id)
+        self.assertEqual(order.status, 'completed')
+        self.assertIsNotNone(order.completed_at)
+        self.assertEqual(order.discount_code, 'senior')
+        self.assertEqual(order.discount, quote['discount'])
+        self.assertEqual(order.tax, quote['tax'])
+        self.assertEqual(order.total_price, quote['total_price'])
+        self.assertEqual([(i.name, i.qty) for i in order.items], [("Sinigang na Baboy", 1), ("Rice", 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,9 @@
+from collections import deque
+
 from kivy.lang import Builder
 from kivy.modules.recorder import on_recorder_key
 from kivymd.app import MDApp
-from kivy.properties import StringProperty
+from kivy.properties import StringProperty, NumericProperty
 from kivy.core.window import Window
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.label import MDLabel
@@ -9,28 +11,93 @@ from kivymd.uix.button import MDIconButton
 
 Window.size = (400, 650)
 
-class Queue:
+STATUSES = ["Pending", "Ongoing", "Ready to Serve"]
+
+
+class OrderQueue:
+    """FIFO of open orders with a hash index on order id.
+
+    The deque keeps arrival order and `index` maps order id -> order, so
+    enqueue, dequeue, duplicate checks, status changes and removal are all
+    O(1). Removing an order from the middle only drops it from the index;
+    its deque entry is left as a tombstone that dequeue skips, and the deque
+    is compacted once tombstones outnumber live orders.
+    """
     def __init__(self):
-        self.queue = []
+        self.queue = deque()   # order dicts in arrival order, tombstones included
+        self.index = {}        # order id -> live order dict
+        self.removed = 0       # tombstones still in the deque
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, order_id):
+        return order_id in self.index
 
-    def enqueue(self, dataval):
-        if dataval not in self.queue:
-            self.queue.append(dataval)
-            return True
-        else:
+    def __iter__(self):
+        """Open orders in arrival order"""
+        return (order for order in self.queue if self._is_live(order))
+
+    def _is_live(self, order):
+        # Identity check, so an id that was removed and enqueued again does
+        # not bring its old deque entry back to life
+        return self.index.get(order['id']) is order
+
+    def enqueue(self, order):
+        """Add an order; returns False if its id is already open"""
+        if order['id'] in self.index:
             return False
+        order.setdefault('status', STATUSES[0])
+        self.index[order['id']] = order
+        self.queue.append(order)
+        return True
 
     def dequeue(self):
-        if len(self.queue) <= 0:
-            return "Queue is empty"
-        else:
-            return self.queue.pop(0)
+        """Remove and return the oldest open order, or None if there is none"""
+        while self.queue:
+            order = self.queue.popleft()
+            if self._is_live(order):
+                del self.index[order['id']]
+                return order
+            self.removed -= 1
+        return None
+
+    def peek(self):
+        while self.queue and not self._is_live(self.queue[0]):
+            self.queue.popleft()
+            self.removed -= 1
+        return self.queue[0] if self.queue else None
+
+    def get(self, order_id):
+        return self.index.get(order_id)
+
+    def remove(self, order_id):
+        """Remove any open order by id; returns it, or None if it is not open"""
+        order = self.index.pop(order_id, None)
+        if order is not None:
+            self.removed += 1
+            if self.removed > len(self.index):
+                self.queue = deque(o for o in self.queue if self._is_live(o))
+                self.removed = 0
+        return order
+
+    def set_status(self, order_id, status):
+        """Move an order forward (Pending -> Ongoing -> Ready to Serve).
+
+        Returns False if the order is not open or the status would go backwards.
+        """
+        order = self.index.get(order_id)
+        if order is None or STATUSES.index(status) <= STATUSES.index(order['status']):
+            return False
+        order['status'] = status
+        return True
 
     def is_empty(self):
-        return len(self.queue) == 0
+        return not self.index
 
 
 class OrderItem(MDBoxLayout):
+    order_id = NumericProperty()
     order_text = StringProperty()
     order_details = StringProperty()
     on_status_change = None
@@ -72,14 +139,12 @@ class OrderItem(MDBoxLayout):
         self.add_widget(self.delete_btn)
 
     def mark_ongoing(self, instance):
-        self.label.text = f"{self.label.text.split(' [')[0]} [Ongoing]"
         if self.on_status_change:
-            self.on_status_change(self)
+            self.on_status_change(self, "Ongoing")
 
     def mark_ready(self, instance):
-        self.label.text = f"{self.label.text.split(' [')[0]} [Ready to Serve]"
         if self.on_status_change:
-            self.on_status_change(self)
+            self.on_status_change(self, "Ready to Serve")
 
     def remove_order(self, instance):
         if self.on_remove:
@@ -97,33 +162,45 @@ class StaffDashboardApp(MDApp):
         self.populate_orders()
 
     def populate_orders(self):
-        self.orders = Queue()
-        orders_list = self.root.ids.orders_list
+        self.orders = OrderQueue()
+        self.order_items = {}   # order id -> its OrderItem, so updates never search the list
 
         sample_orders = [
-            {"title": "Order #101 - Burger & Fries", "details": "Burger with cheese."},
-            {"title": "Order #102 - Vegan Salad", "details": "Mixed greens."},
-            {"title": "Order #103 - Coffee & Donut", "details": "Glazed donut."},
+            {"id": 101, "title": "Order #101 - Burger & Fries", "details": "Burger with cheese."},
+            {"id": 102, "title": "Order #102 - Vegan Salad", "details": "Mixed greens."},
+            {"id": 103, "title": "Order #103 - Coffee & Donut", "details": "Glazed donut."},
         ]
         for order in sample_orders:
-            item = OrderItem(
-                order_text=f"{order['title']} [Pending]",
-                order_details=order['details']
-            )
-            self.orders.enqueue(order)
-            item.on_status_change = self.on_order_status_change
-            item.on_remove = self.on_order_remove
-            orders_list.add_widget(item)
-
-    def on_order_status_change(self, order_item):
-        removed_order = self.orders.dequeue()
-        print(f"Processed order: {removed_order}")
+            self.add_order(order)
+
+    def add_order(self, order):
+        """Queue an order and show its ticket; duplicates are ignored"""
+        if not self.orders.enqueue(order):
+            return False
+        item = OrderItem(
+            order_id=order['id'],
+            order_text=f"{order['title']} [{order['status']}]",
+            order_details=order['details']
+        )
+        item.on_status_change = self.on_order_status_change
+        item.on_remove = self.on_order_remove
+        self.order_items[order['id']] = item
+        self.orders_list.add_widget(item)
+        return True
+
+    def on_order_status_change(self, order_item, status):
+        if self.orders.set_status(order_item.order_id, status):
+            order = self.orders.get(order_item.order_id)
+            order_item.order_text = f"{order['title']} [{status}]"
+            print(f"Order {order['id']}: {status}")
 
     def on_order_remove(self, order_item):
-        removed_order = order_item.order_text.split(' [')[0]
-        self.orders.queue = [order for order in self.orders.queue if order != removed_order]
-        print(f"Removed order: {removed_order}")
-        self.orders_list.remove_widget(order_item)
+        removed_order = self.orders.remove(order_item.order_id)
+        if removed_order is not None:
+            print(f"Removed order: {removed_order['title']}")
+        item = self.order_items.pop(order_item.order_id, None)
+        if item is not None:
+            self.orders_list.remove_widget(item)
 
 
 if __name__ == '__main__':